@@ -1,13 +1,32 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
+import tkinter.font as tkfont
 from fpdf import FPDF
+import bisect
+import hashlib
+import itertools
 import json
+import locale
+import lzma
 import os
-from datetime import datetime
+import queue
+import re
+import sqlite3
+import struct
+import sys
+import zlib
+import tempfile
+from datetime import date, datetime, timedelta
 from tkinterdnd2 import DND_FILES, TkinterDnD
 import threading
 import time
+from urllib.request import pathname2url
 import requests
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # Override the _QueryString class to make the entry wider
 class _QueryString(simpledialog._QueryString):
@@ -30,6 +49,1961 @@ def askstring(title, prompt, **kw):
 # Replace simpledialog.askstring with our custom version
 simpledialog.askstring = askstring
 
+ACCOMPLISHED_SUFFIX = " (Accomplished)"
+RENDER_PATCH_LIMIT = 64  # Queued row changes per box beyond which a flush rebuilds the box instead
+VIRTUAL_BOX_THRESHOLD = 5000  # Boxes larger than this switch to virtualized task boxes on open
+LOAD_CHUNK_SIZE = 500  # Tasks handed from the loader thread to the UI at a time
+LOAD_SLICE_MS = 15  # UI time spent adding loaded tasks before yielding to events
+JOURNAL_SUFFIX = ".journal"  # Append-only edit journal kept next to the board file
+JOURNAL_COMPACT_BYTES = 256 * 1024  # Journal size that triggers folding it into a fresh snapshot
+UNDO_HISTORY_SUFFIX = ".undo"  # Append-only undo history kept next to the board file
+UNDO_HISTORY_COMPACT_BYTES = 1024 * 1024  # History file size that triggers rewriting it from the stacks in memory
+APP_DIR = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state'),
+    'DailyReporter'
+)
+SETTINGS_PATH = os.path.join(APP_DIR, 'settings.json')
+RECOVERY_DIR = os.path.join(APP_DIR, 'recovery')
+RECOVERY_VERSIONS = 3  # Recovery snapshots kept per session
+RECOVERY_DELAY = 5  # Seconds after an unsaved edit before it reaches the recovery snapshot
+WATCH_INTERVAL_MS = 2000  # How often the open board is checked for changes made by someone else
+COMPLETION_POLL_MS = 50  # How often the UI picks up results posted by background threads
+DAILY_BOARD_FORMAT = "Daily board %Y%m%d.json"  # File name of each day's board in a daily workspace
+DAILY_BOARD_PATTERN = re.compile(r'Daily board (\d{8})\.json$')
+MANIFEST_NAME = "manifest.json"  # Index of the daily boards, kept in the workspace folder
+MANIFEST_VERSION = 1
+RECENT_FILES = 10  # Boards listed under File > Recent Files
+SNAPSHOT_CACHE_TASKS = 250000  # Tasks kept decoded in memory, across all cached boards
+UNDO_MAX_ENTRIES = 1000  # Default undo budget: steps kept across the undo and redo stacks
+UNDO_MAX_MEGABYTES = 64  # Default undo budget: approximate memory held by those steps
+UNDO_MERGE_SECONDS = 2  # Default window in which further edits to the same task join the last undo step
+
+def load_settings():
+    """Read the per-user settings, empty when there are none yet"""
+    try:
+        with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_settings(settings):
+    os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
+    write_atomic(SETTINGS_PATH, json.dumps(settings, ensure_ascii=False, indent=4).encode('utf-8'))
+
+def daily_board_path(workspace, day):
+    return os.path.join(workspace, day.strftime(DAILY_BOARD_FORMAT))
+
+def daily_board_date(path):
+    """The day a daily board file belongs to, or None for any other file"""
+    match = DAILY_BOARD_PATTERN.match(os.path.basename(path))
+    if match is None:
+        return None
+    try:
+        return datetime.strptime(match.group(1), '%Y%m%d').date()
+    except ValueError:
+        return None
+
+def latest_daily_board(workspace, before):
+    """Path of the newest daily board in the workspace dated before the given day, or None"""
+    latest = None
+    for name in os.listdir(workspace):
+        day = daily_board_date(name)
+        if day is not None and day < before and (latest is None or day > latest[0]):
+            latest = (day, name)
+    return os.path.join(workspace, latest[1]) if latest else None
+
+def manifest_path(workspace):
+    return os.path.join(workspace, MANIFEST_NAME)
+
+def load_manifest(workspace):
+    """Read the workspace manifest as {file name: entry}, empty when it is missing or unreadable"""
+    try:
+        with open(manifest_path(workspace), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get('boards', {}) if data.get('manifest') == MANIFEST_VERSION else {}
+
+def save_manifest(workspace, boards):
+    data = {'manifest': MANIFEST_VERSION, 'boards': boards}
+    write_atomic(manifest_path(workspace), json.dumps(data, ensure_ascii=False, indent=1).encode('utf-8'))
+
+def manifest_entry(path, counts, stats, digests):
+    """Manifest entry of a board: its day, per-box [total, accomplished] counts, content hash and mtime
+
+    The stats of the board and its journal are kept too, so a later refresh
+    can tell the entry is still current without reading the board.
+    """
+    day = daily_board_date(path)
+    return {
+        'date': day.isoformat() if day else None,
+        'counts': counts,
+        'hash': hashlib.blake2b('/'.join(digest or '-' for digest in digests).encode('ascii'), digest_size=16).hexdigest(),
+        'mtime': max(stat[1] for stat in stats if stat) if any(stats) else None,
+        'stats': [list(stat) if stat else None for stat in stats],
+    }
+
+def update_manifest(workspace, path, counts, stats, digests):
+    """Record one saved board in the workspace manifest, leaving the other entries alone"""
+    boards = load_manifest(workspace)
+    boards[os.path.basename(path)] = manifest_entry(path, counts, stats, digests)
+    save_manifest(workspace, boards)
+
+def refresh_manifest(workspace, boxes):
+    """Bring the manifest up to date with the daily boards in the workspace and return its entries
+
+    Entries whose recorded stats still match their files are trusted as they
+    are; only boards that are new, or were changed outside the app, are read.
+    """
+    boards = load_manifest(workspace)
+    names = {name for name in os.listdir(workspace) if daily_board_date(name)}
+    changed = False
+    for name in list(boards):
+        if name not in names:
+            del boards[name]
+            changed = True
+    for name in names:
+        path = os.path.join(workspace, name)
+        stats = board_file_stats(path)
+        entry = boards.get(name)
+        if entry is not None and entry.get('stats') == [list(stat) if stat else None for stat in stats]:
+            continue
+        try:
+            snapshot, ops = read_board(path, boxes)
+        except Exception as e:
+            print(f"Error indexing {name}: {e}")
+            continue
+        counts = {priority: [len(records), sum(1 for record in records if record[2])] for priority, records in snapshot.items()}
+        boards[name] = manifest_entry(path, counts, stats, board_file_digests(path, stats))
+        changed = True
+    if changed:
+        save_manifest(workspace, boards)
+    return boards
+
+class Task:
+    """A single task on the board"""
+    __slots__ = ('id', 'text', 'done', 'created', 'accomplished', 'box')
+    _next_id = 1
+
+    def __init__(self, text, box, done=False, created=None, accomplished=None, task_id=None):
+        if task_id is None:
+            task_id = Task._next_id
+        if task_id >= Task._next_id:
+            Task._next_id = task_id + 1
+        self.id = task_id
+        self.text = text
+        self.done = done
+        self.created = created if created is not None else time.time()
+        self.accomplished = accomplished
+        self.box = box
+
+    def __str__(self):
+        # Text shown in the task boxes and the PDF export
+        return self.text + ACCOMPLISHED_SUFFIX if self.done else self.text
+
+    def __repr__(self):
+        return f"Task({self.id}, {str(self)!r}, {self.box!r})"
+
+    def to_dict(self):
+        """Convert the task to a JSON-friendly dictionary"""
+        return record_to_dict(self.record())
+
+    def record(self):
+        """Return an immutable (id, text, done, created, accomplished) copy of the task"""
+        return (self.id, self.text, self.done, self.created, self.accomplished)
+
+    @classmethod
+    def from_dict(cls, data, box):
+        """Build a task from a saved entry, either a dictionary or a legacy suffix-tagged string"""
+        return cls.from_record(entry_to_record(data), box)
+
+    @classmethod
+    def from_record(cls, record, box):
+        """Build a task from an (id, text, done, created, accomplished) record, where id may be None"""
+        task_id, text, done, created, accomplished = record
+        return cls(text, box, done=done, created=created, accomplished=accomplished, task_id=task_id)
+
+def entry_to_record(entry):
+    """Convert a saved JSON entry, a dictionary or a legacy suffix-tagged string, to a task record"""
+    if isinstance(entry, str):
+        done = entry.endswith(ACCOMPLISHED_SUFFIX)
+        return (None, entry[:-len(ACCOMPLISHED_SUFFIX)] if done else entry, done, None, None)
+    return (entry.get('id'), entry['text'], entry.get('done', False), entry.get('created'), entry.get('accomplished'))
+
+def record_to_dict(record):
+    """Convert a task record tuple to the dictionary saved in board files"""
+    task_id, text, done, created, accomplished = record
+    data = {'id': task_id, 'text': text, 'done': done, 'created': created}
+    if accomplished is not None:
+        data['accomplished'] = accomplished
+    return data
+
+def snapshot_to_data(snapshot):
+    """Convert a board snapshot ({priority: (record, ...)}) into plain JSON data"""
+    return {priority: [record_to_dict(record) for record in records] for priority, records in snapshot.items()}
+
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def write_atomic(path, data):
+    """Write bytes to path through a synced temp file and a rename, so the file is never torn"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # Keep the permissions of the file being replaced, or use the usual ones for a new file
+            mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o666 & ~UMASK
+            os.chmod(temp_path, mode)
+        except OSError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+def is_sqlite_path(path):
+    return os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS
+
+class SqliteBoard:
+    """SQLite board storage in WAL mode, used for files with a .db extension
+
+    Tasks are rows indexed by box and position, status and creation date.
+    Saves apply the journalled edits, each in its own small transaction,
+    instead of rewriting the board. The connection is opened with an SQLite
+    URI mode: 'ro' for reading, 'rw' for edits to an existing board and
+    'rwc' for writing a whole board; only the latter sets up the schema.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            box TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            created REAL,
+            accomplished REAL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_box_position ON tasks (box, position);
+        CREATE INDEX IF NOT EXISTS tasks_done ON tasks (box, done);
+        CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created);
+    """
+
+    COLUMNS = {'id', 'box', 'position', 'text', 'done', 'created', 'accomplished'}
+
+    def __init__(self, path, mode='ro'):
+        self.conn = sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode={mode}', uri=True)
+        if mode != 'ro':
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    def check_schema(self):
+        """Raise ValueError unless the database holds a task board this program can read"""
+        schema = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if schema > BOARD_SCHEMA:
+            raise ValueError(f"Board schema {schema} is newer than this program supports")
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(tasks)')}
+        if not self.COLUMNS <= columns:
+            raise ValueError("Not a task board: no tasks table found")
+
+    def close(self):
+        self.conn.close()
+
+    def iter_records(self, boxes, chunk_size):
+        """Yield (priority, records, progress) for each box in position order, through the (box, position) index"""
+        total = self.conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] or 1
+        loaded = 0
+        for priority in boxes:
+            cursor = self.conn.execute(
+                'SELECT id, text, done, created, accomplished FROM tasks WHERE box = ? ORDER BY position',
+                (priority,)
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                loaded += len(rows)
+                yield priority, [
+                    (task_id, text, bool(done), created, accomplished)
+                    for task_id, text, done, created, accomplished in rows
+                ], loaded / total
+
+    def replace(self, snapshot):
+        """Replace the whole board with a snapshot in one transaction"""
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+        with self.conn:
+            self.conn.execute('DELETE FROM tasks')
+            self.conn.execute(f'PRAGMA user_version = {BOARD_SCHEMA}')
+            self.conn.executemany(
+                'INSERT INTO tasks (id, box, position, text, done, created, accomplished) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    (task_id, priority, position, text, int(done), created, accomplished)
+                    for priority, records in snapshot.items()
+                    for position, (task_id, text, done, created, accomplished) in enumerate(records)
+                )
+            )
+
+    def apply(self, op):
+        """Apply one journalled edit (see TaskManager.apply_journal_op) as a transaction"""
+        with self.conn:
+            kind = op['op']
+            if kind == 'add':
+                task = op['task']
+                self._insert(op['box'], op['index'], (
+                    task['id'], task['text'], int(task.get('done', False)), task.get('created'), task.get('accomplished')
+                ))
+            elif kind == 'clear':
+                self.conn.execute('DELETE FROM tasks WHERE done = 1')
+                for (box,) in self.conn.execute('SELECT DISTINCT box FROM tasks').fetchall():
+                    ids = self.conn.execute('SELECT id FROM tasks WHERE box = ? ORDER BY position', (box,)).fetchall()
+                    self.conn.executemany('UPDATE tasks SET position = ? WHERE id = ?',
+                                          ((position, task_id) for position, (task_id,) in enumerate(ids)))
+            elif kind == 'reinsert':
+                # Merge the tasks back in one pass rather than shifting the box once per task
+                box = op['box']
+                existing = self.conn.execute('SELECT id FROM tasks WHERE box = ? ORDER BY position', (box,)).fetchall()
+                rows = merge_at_positions(existing, [(index, tuple(row)) for index, row in op['tasks']])
+                self.conn.executemany('UPDATE tasks SET position = ? WHERE id = ?',
+                                      ((position, row[0]) for position, row in enumerate(rows) if len(row) == 1))
+                self.conn.executemany(
+                    'INSERT INTO tasks (id, box, position, text, done, created, accomplished) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ((row[0], box, position, row[1], int(row[2]), row[3], row[4])
+                     for position, row in enumerate(rows) if len(row) > 1)
+                )
+            elif kind == 'modify':
+                self.conn.execute('UPDATE tasks SET text = ? WHERE id = ?', (op['text'], op['id']))
+            elif kind == 'accomplish':
+                self.conn.execute('UPDATE tasks SET done = 1, accomplished = ? WHERE id = ?', (op['at'], op['id']))
+            elif kind == 'restore':
+                self.conn.execute('UPDATE tasks SET done = 0, accomplished = NULL WHERE id = ?', (op['id'],))
+            elif kind in ('delete', 'move', 'drag'):
+                row = self._remove(op['id'])
+                if row is not None and kind != 'delete':
+                    self._insert(op['box'], op['index'], row)
+
+    def _insert(self, box, index, row):
+        count = self.conn.execute('SELECT COUNT(*) FROM tasks WHERE box = ?', (box,)).fetchone()[0]
+        index = min(index, count)
+        self.conn.execute('UPDATE tasks SET position = position + 1 WHERE box = ? AND position >= ?', (box, index))
+        task_id, text, done, created, accomplished = row
+        self.conn.execute(
+            'INSERT INTO tasks (id, box, position, text, done, created, accomplished) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (task_id, box, index, text, done, created, accomplished)
+        )
+
+    def _remove(self, task_id):
+        row = self.conn.execute(
+            'SELECT box, position, text, done, created, accomplished FROM tasks WHERE id = ?', (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        box, position, text, done, created, accomplished = row
+        self.conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        self.conn.execute('UPDATE tasks SET position = position - 1 WHERE box = ? AND position > ?', (box, position))
+        return task_id, text, done, created, accomplished
+
+BINARY_MAGIC = b'DTBD'
+BINARY_VERSION = 1
+# Binary board extensions and the compression each one selects (0 none, 1 zlib, 2 lzma)
+BINARY_EXTENSIONS = {'.dtb': 0, '.dtbz': 1, '.dtbx': 2}
+BINARY_COMPRESSORS = {
+    0: (bytes, bytes),
+    1: (zlib.compress, zlib.decompress),
+    2: (lzma.compress, lzma.decompress),
+}
+
+def is_binary_path(path):
+    return os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS
+
+def _pack_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _unpack_varint(data, offset):
+    result = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+def encode_binary_board(snapshot, compression=0):
+    """Encode a board snapshot in the compact binary format
+
+    Layout: magic, version byte and compression byte, then the (optionally
+    compressed) body: an interned string table followed by each box as its
+    name index, task count and length-prefixed task records. A record holds
+    id, text index, flags (done / has created / has accomplished) and the
+    timestamps as doubles, so it round-trips losslessly with JSON.
+    """
+    strings = {}
+    def intern(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    boxes = bytearray()
+    _pack_varint(len(snapshot), boxes)
+    record = bytearray()
+    for priority, records in snapshot.items():
+        _pack_varint(intern(priority), boxes)
+        _pack_varint(len(records), boxes)
+        for task_id, text, done, created, accomplished in records:
+            record.clear()
+            _pack_varint(task_id, record)
+            _pack_varint(intern(text), record)
+            record.append((1 if done else 0) | (2 if created is not None else 0) | (4 if accomplished is not None else 0))
+            if created is not None:
+                record += struct.pack('<d', created)
+            if accomplished is not None:
+                record += struct.pack('<d', accomplished)
+            _pack_varint(len(record), boxes)
+            boxes += record
+
+    body = bytearray()
+    _pack_varint(len(strings), body)
+    for text in strings:
+        encoded = text.encode('utf-8')
+        _pack_varint(len(encoded), body)
+        body += encoded
+    body += boxes
+    compress = BINARY_COMPRESSORS[compression][0]
+    return BINARY_MAGIC + bytes((BINARY_VERSION, compression)) + compress(bytes(body))
+
+def decode_binary_board(data):
+    """Decode a binary board into a snapshot ({priority: [record, ...]})"""
+    if data[:4] != BINARY_MAGIC:
+        raise ValueError("Not a binary task board")
+    version, compression = data[4], data[5]
+    if version > BINARY_VERSION:
+        raise ValueError(f"Binary board version {version} is newer than this program supports")
+    body = memoryview(BINARY_COMPRESSORS[compression][1](data[6:]))
+
+    count, offset = _unpack_varint(body, 0)
+    strings = []
+    for _ in range(count):
+        length, offset = _unpack_varint(body, offset)
+        strings.append(str(body[offset:offset + length], 'utf-8'))
+        offset += length
+
+    snapshot = {}
+    box_count, offset = _unpack_varint(body, offset)
+    for _ in range(box_count):
+        name, offset = _unpack_varint(body, offset)
+        task_count, offset = _unpack_varint(body, offset)
+        records = snapshot[strings[name]] = []
+        for _ in range(task_count):
+            length, offset = _unpack_varint(body, offset)
+            end = offset + length
+            task_id, offset = _unpack_varint(body, offset)
+            text, offset = _unpack_varint(body, offset)
+            flags = body[offset]
+            offset += 1
+            created = accomplished = None
+            if flags & 2:
+                created = struct.unpack_from('<d', body, offset)[0]
+                offset += 8
+            if flags & 4:
+                accomplished = struct.unpack_from('<d', body, offset)[0]
+            records.append((task_id, strings[text], bool(flags & 1), created, accomplished))
+            offset = end  # Skip fields added by later versions
+    return snapshot
+
+class JsonCodec:
+    """A JSON library behind the board files, encoding to UTF-8 bytes with non-ASCII text kept as is
+
+    ``dumps(data, indent)`` writes the readable indented layout, or the
+    compact one without any whitespace when ``indent`` is false. ``loads``
+    takes text or UTF-8 bytes.
+    """
+
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+def load_json_codecs():
+    """Return a codec for each JSON library installed, fastest first, the stdlib one last"""
+    codecs = []
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        def dumps(data, indent=True):
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)  # orjson only indents by two
+        codecs.append(JsonCodec('orjson', dumps, orjson.loads))
+    try:
+        import ujson
+    except ImportError:
+        pass
+    else:
+        def dumps(data, indent=True):
+            return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False, indent=4 if indent else 0).encode('utf-8')
+        codecs.append(JsonCodec('ujson', dumps, ujson.loads))
+
+    def dumps(data, indent=True):
+        return json.dumps(data, ensure_ascii=False, indent=4 if indent else None,
+                          separators=(',', ': ') if indent else (',', ':')).encode('utf-8')
+    codecs.append(JsonCodec('json', dumps, json.loads))
+    return codecs
+
+JSON_CODECS = load_json_codecs()
+JSON_CODEC = JSON_CODECS[0]  # Used for board files and journals
+
+def synthetic_board(tasks, boxes=4):
+    """Build a board snapshot of the given size, as a benchmark input"""
+    created = time.time()
+    snapshot = {f"Priority {i}": [] for i in range(1, boxes + 1)}
+    for task_id in range(1, tasks + 1):
+        done = task_id % 3 == 0
+        text = f"Task {task_id}: follow up on the weekly report, ticket #{task_id * 7} (检查)"
+        record = (task_id, text, done, created + task_id, created + task_id * 2 if done else None)
+        snapshot[f"Priority {task_id % boxes + 1}"].append(record)
+    return snapshot
+
+def benchmark_json_codecs(tasks=100000, rounds=3):
+    """Print the encode and decode throughput of each installed codec on a synthetic board"""
+    data = {'schema': BOARD_SCHEMA}
+    data.update(snapshot_to_data(synthetic_board(tasks)))
+    print(f"Synthetic board: {tasks} tasks, best of {rounds} rounds")
+    for codec in JSON_CODECS:
+        for indent in (True, False):
+            encoded = codec.dumps(data, indent)
+            encode = decode = float('inf')
+            for _ in range(rounds):
+                start = time.perf_counter()
+                codec.dumps(data, indent)
+                encode = min(encode, time.perf_counter() - start)
+                start = time.perf_counter()
+                codec.loads(encoded)
+                decode = min(decode, time.perf_counter() - start)
+            megabytes = len(encoded) / (1024 * 1024)
+            layout = "indented" if indent else "compact"
+            print(f"{codec.name:>7} {layout:>8}: {megabytes:7.1f} MB, "
+                  f"encode {megabytes / encode:7.1f} MB/s, decode {megabytes / decode:7.1f} MB/s")
+
+BOARD_SCHEMA = 2  # Version stamped on saved boards; unstamped JSON and text outlines are version 1
+SQLITE_MAGIC = b'SQLite format 3\x00'
+BOARD_SNIFF_BYTES = 64
+_SCHEMA_HEADER = re.compile(r'\s*\{\s*"schema"\s*:\s*(\d+)')
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_TEXT_SECTION = re.compile(r'Priority \d+:$')
+
+def sniff_board_format(head):
+    """Tell a board format from the first bytes of its file
+
+    Returns (format, schema), format being 'sqlite', 'binary', 'json' for
+    schema-stamped JSON, 'legacy' for the unstamped JSON of older drafts or
+    'text' for the outline drafts 1.0.004 and 1.0.005 saved.
+    """
+    if head.startswith(SQLITE_MAGIC):
+        return 'sqlite', None
+    if head.startswith(BINARY_MAGIC):
+        return 'binary', None
+    text = head.decode('utf-8', errors='ignore').lstrip('\ufeff')
+    match = _SCHEMA_HEADER.match(text)
+    if match:
+        return 'json', int(match.group(1))
+    if text.lstrip().startswith('{'):
+        return 'legacy', 1
+    return 'text', 1
+
+def decode_board_text(data):
+    """Decode a text board, falling back to the locale encoding older drafts saved with"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode(locale.getpreferredencoding(False))
+
+def iter_json_board(text):
+    """Yield (key, value, position, element) for the members of a JSON board
+
+    List members are yielded one entry at a time with ``element`` set, each
+    decoded on its own, so callers can hand tasks on before the whole
+    document has been parsed. Other members (the schema stamp, the wrapper
+    of draft 1.0.007) are decoded whole.
+    """
+    decoder = json.JSONDecoder()
+    skip = _JSON_WHITESPACE.match
+
+    def expect(char, pos):
+        pos = skip(text, pos).end()
+        if text[pos:pos + 1] != char:
+            raise ValueError(f"Expected {char!r} at position {pos} of the board file")
+        return skip(text, pos + 1).end()
+
+    pos = expect('{', 0)
+    if text[pos:pos + 1] == '}':
+        return
+    while True:
+        key, pos = decoder.raw_decode(text, pos)
+        pos = expect(':', pos)
+        if text[pos:pos + 1] != '[':
+            value, pos = decoder.raw_decode(text, pos)
+            yield key, value, pos, False
+        else:
+            pos = skip(text, pos + 1).end()
+            if text[pos:pos + 1] == ']':
+                pos += 1
+            else:
+                while True:
+                    entry, pos = decoder.raw_decode(text, pos)
+                    yield key, entry, pos, True
+                    pos = skip(text, pos).end()
+                    if text[pos:pos + 1] == ']':
+                        pos += 1
+                        break
+                    pos = expect(',', pos)
+        pos = skip(text, pos).end()
+        if text[pos:pos + 1] == '}':
+            return
+        pos = expect(',', pos)
+
+def iter_legacy_board(text):
+    """Yield (priority, entry, position) from unstamped JSON, unwrapping the shapes older drafts saved"""
+    for key, value, position, element in iter_json_board(text):
+        if element:
+            yield key, value, position
+        elif key == 'tasks' and isinstance(value, dict):
+            # Draft 1.0.007 wrapped the boxes together with its counters
+            for priority, entries in value.items():
+                if not isinstance(entries, list):
+                    raise ValueError(f"Task box {priority!r} is not a list")
+                for entry in entries:
+                    yield priority, entry, position
+        elif key not in ('task_count', 'accomplished_count'):
+            raise ValueError(f"Task box {key!r} is not a list")
+
+def iter_text_board(text):
+    """Yield (priority, entry, position) from the plain-text outline of drafts 1.0.004 and 1.0.005
+
+    Text without a single "Priority N:" section is not a board, and raises
+    ValueError rather than opening as an empty one that the next save overwrites.
+    """
+    priority = None
+    position = 0
+    sections = 0
+    for line in text.splitlines(True):
+        position += len(line)
+        line = line.strip()
+        if line.startswith('- '):
+            if priority is not None:
+                yield priority, line[2:], position
+        elif line.endswith(':'):
+            priority = line[:-1]
+            sections += bool(_TEXT_SECTION.match(line))
+    if not sections:
+        raise ValueError("Not a task board: no 'Priority N:' section found")
+
+def validate_entries(entries, boxes):
+    """Pass (priority, entry, position) items through, rejecting unknown boxes and malformed tasks"""
+    for priority, entry, position in entries:
+        if priority not in boxes:
+            raise ValueError(f"Unknown task box {priority!r}")
+        if not (isinstance(entry, str) or isinstance(entry, dict) and isinstance(entry.get('text'), str)):
+            raise ValueError(f"Malformed task in {priority!r}: {entry!r}")
+        yield priority, entry, position
+
+def chunk_records(items, size, chunk_size):
+    """Group (priority, record, position) items into (priority, records, progress) chunks of one box each"""
+    chunk, current = [], None
+    for priority, record, position in items:
+        if chunk and (priority != current or len(chunk) >= chunk_size):
+            yield current, chunk, position / size
+            chunk = []
+        current = priority
+        chunk.append(record)
+    if chunk:
+        yield current, chunk, 1.0
+
+def iter_board_chunks(path, boxes, chunk_size=LOAD_CHUNK_SIZE):
+    """Read a board file of any format piece by piece, yielding (priority, records, progress)
+
+    Used by the loader thread. The format comes from a sniff of the file
+    header, not the extension. JSON stamped with the current schema was
+    written by this program and takes a fast path with no validation; older
+    formats are checked against the given boxes and migrated to task records
+    in the same pass. Progress runs from 0 to 1.
+    """
+    if is_sharded_path(path):
+        yield from iter_sharded_board(path, boxes, chunk_size)
+        return
+    with open(path, 'rb') as f:
+        head = f.read(BOARD_SNIFF_BYTES)
+    kind, schema = sniff_board_format(head)
+
+    if kind == 'sqlite':
+        board = SqliteBoard(path)
+        try:
+            board.check_schema()
+            # Rows are read box by box, so rows of other boxes would be left out without a word
+            for (priority,) in board.conn.execute('SELECT DISTINCT box FROM tasks'):
+                if priority not in boxes:
+                    raise ValueError(f"Unknown task box {priority!r}")
+            yield from board.iter_records(boxes, chunk_size)
+        finally:
+            board.close()
+        return
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    if kind == 'binary':
+        snapshot = decode_binary_board(data)
+        total = sum(map(len, snapshot.values())) or 1
+        loaded = 0
+        for priority, records in snapshot.items():
+            if priority not in boxes:
+                raise ValueError(f"Unknown task box {priority!r}")
+            for start in range(0, len(records), chunk_size):
+                chunk = records[start:start + chunk_size]
+                loaded += len(chunk)
+                yield priority, chunk, loaded / total
+        return
+
+    if schema > BOARD_SCHEMA:
+        raise ValueError(f"Board schema {schema} is newer than this program supports")
+    text = decode_board_text(data)
+    if kind == 'json' and JSON_CODEC.name != 'json':
+        # A native codec parses the whole board faster than the stdlib one streams its first chunk
+        board = JSON_CODEC.loads(text)
+        board.pop('schema', None)
+        entries = ((key, entry) for key, value in board.items() for entry in value)
+        items = (
+            (key, (entry['id'], entry['text'], entry['done'], entry['created'], entry.get('accomplished')), position)
+            for position, (key, entry) in enumerate(entries)
+        )
+        yield from chunk_records(items, sum(map(len, board.values())) or 1, chunk_size)
+        return
+    if kind == 'json':
+        items = (
+            (key, (entry['id'], entry['text'], entry['done'], entry['created'], entry.get('accomplished')), position)
+            for key, entry, position, element in iter_json_board(text) if element
+        )
+    else:
+        entries = iter_legacy_board(text) if kind == 'legacy' else iter_text_board(text)
+        items = (
+            (priority, entry_to_record(entry), position)
+            for priority, entry, position in validate_entries(entries, boxes)
+        )
+    yield from chunk_records(items, len(text) or 1, chunk_size)
+
+SHARD_EXTENSION = '.board'  # Sharded boards are directories with one file per box
+SHARD_MANIFEST = 'shards.json'
+SHARD_FILE_PATTERN = re.compile(r'\d+-[0-9a-f]{32}\.dtb$')
+
+def is_sharded_path(path):
+    return os.path.splitext(os.path.normpath(path))[1].lower() == SHARD_EXTENSION
+
+def load_shard_manifest(path):
+    with open(os.path.join(path, SHARD_MANIFEST), 'rb') as f:
+        manifest = JSON_CODEC.loads(f.read())
+    if manifest.get('schema', 1) > BOARD_SCHEMA:
+        raise ValueError(f"Board schema {manifest['schema']} is newer than this program supports")
+    return manifest
+
+def write_sharded_board(path, snapshot):
+    """Save a snapshot to a sharded board, writing only the boxes whose content hash changed
+
+    Each box is a binary board named after its hash, so a changed box goes
+    to a new file; the manifest is replaced once every new shard is on
+    disk and shards it no longer names are removed last. A crash at any
+    point leaves the previous or the new board, never a mix.
+    """
+    os.makedirs(path, exist_ok=True)
+    try:
+        previous = {entry['box']: entry for entry in load_shard_manifest(path)['shards']}
+    except (OSError, ValueError, KeyError):
+        previous = {}
+    shards = []
+    for index, (priority, records) in enumerate(snapshot.items()):
+        data = encode_binary_board({priority: records})
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        entry = previous.get(priority)
+        if entry is None or entry['hash'] != digest or not os.path.exists(os.path.join(path, entry['file'])):
+            entry = {'box': priority, 'file': f"{index}-{digest}.dtb", 'hash': digest, 'count': len(records)}
+            write_atomic(os.path.join(path, entry['file']), data)
+        shards.append(entry)
+    write_atomic(os.path.join(path, SHARD_MANIFEST), JSON_CODEC.dumps({'schema': BOARD_SCHEMA, 'shards': shards}))
+    keep = {entry['file'] for entry in shards}
+    for name in os.listdir(path):
+        if SHARD_FILE_PATTERN.match(name) and name not in keep:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+def iter_sharded_board(path, boxes, chunk_size):
+    """Yield (priority, records, progress) from the shards of a sharded board, in manifest order"""
+    shards = load_shard_manifest(path)['shards']
+    total = sum(entry['count'] for entry in shards) or 1
+    loaded = 0
+    for entry in shards:
+        if entry['box'] not in boxes:
+            raise ValueError(f"Unknown task box {entry['box']!r}")
+        with open(os.path.join(path, entry['file']), 'rb') as f:
+            records = decode_binary_board(f.read()).get(entry['box'], [])
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            loaded += len(chunk)
+            yield entry['box'], chunk, loaded / total
+
+def journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+class JournalMismatch(ValueError):
+    """A journal lies next to a board but was not written on top of that snapshot"""
+
+def journal_header(path, data):
+    """First journal line, tying the journal to the snapshot bytes data just written at path"""
+    stat = os.stat(path)
+    return json.dumps({
+        'journal': 2, 'base_size': stat.st_size, 'base_mtime': stat.st_mtime_ns,
+        'base_hash': hashlib.blake2b(data, digest_size=16).hexdigest(),
+    }) + '\n'
+
+def journal_matches(path, line):
+    """Whether a journal header line belongs to the snapshot at path
+
+    The size and mtime are checked first; when only the mtime differs (a sync
+    client touched the file, a file system with coarse timestamps, a copy)
+    the snapshot's content hash decides. Version 1 headers carry no hash.
+    """
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return False
+    stat = os.stat(path)
+    if not isinstance(header, dict) or header.get('base_size') != stat.st_size:
+        return False
+    if header.get('base_mtime') == stat.st_mtime_ns:
+        return True
+    return 'base_hash' in header and file_digest(path) == header['base_hash']
+
+def write_snapshot(path, snapshot, compact=False):
+    """Write a full board snapshot and start a fresh journal for it, JSON boards without indentation if compact"""
+    if is_sharded_path(path):
+        write_sharded_board(path, snapshot)
+        return
+    if is_sqlite_path(path):
+        board = SqliteBoard(path, 'rwc')
+        try:
+            board.replace(snapshot)
+        finally:
+            board.close()
+        return
+    if is_binary_path(path):
+        data = encode_binary_board(snapshot, BINARY_EXTENSIONS[os.path.splitext(path)[1].lower()])
+    else:
+        data = {'schema': BOARD_SCHEMA}
+        data.update(snapshot_to_data(snapshot))
+        data = JSON_CODEC.dumps(data, not compact)
+    write_atomic(path, data)
+    write_atomic(journal_path(path), journal_header(path, data).encode('utf-8'))
+
+def append_journal(path, lines):
+    """Append journalled edits to the journal of the board at path"""
+    if is_sqlite_path(path):
+        board = SqliteBoard(path, 'rw')
+        try:
+            for line in lines:
+                board.apply(JSON_CODEC.loads(line))
+        finally:
+            board.close()
+        return
+    with open(journal_path(path), 'ab') as f:
+        f.write(b''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_journal(path):
+    """Return (edits, intact) journalled on top of the snapshot at path, or None without a journal
+
+    Raises JournalMismatch for a journal whose header does not match the
+    snapshot (the board was rewritten by something else), rather than quietly
+    dropping its edits. Reading stops at the first torn line; intact is False
+    then, as edits appended after it could never be read back.
+    """
+    try:
+        with open(journal_path(path), 'rb') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    if not lines:
+        return None
+    if not journal_matches(path, lines[0]):
+        raise JournalMismatch(f"The edit journal of {os.path.basename(path)} does not match the board")
+    ops = parse_journal_lines(lines[1:])
+    return ops, len(ops) == len(lines) - 1 and lines[-1].endswith(b'\n')
+
+def parse_journal_lines(lines):
+    """Decode journal lines into edits, stopping at the first torn line"""
+    ops = []
+    for line in lines:
+        try:
+            ops.append(JSON_CODEC.loads(line))
+        except ValueError:
+            break
+    return ops
+
+UNDO_HISTORY_HEADER = b'{"undo": 1}\n'
+
+def undo_history_path(path):
+    return path + UNDO_HISTORY_SUFFIX
+
+def write_undo_history(path, lines, stats, append):
+    """Write a batch of undo history lines for the board at path, closed by the board's file stats as just saved
+
+    The batch is appended, or replaces the whole file when append is false.
+    A batch only counts once its closing mark is on disk; one appended
+    after a torn batch starts on a line of its own, and one appended to a
+    missing or empty file starts it with the header.
+    """
+    data = b'["begin"]\n' + b''.join(lines) + JSON_CODEC.dumps(['mark', stats], False) + b'\n'
+    if not append:
+        write_atomic(undo_history_path(path), UNDO_HISTORY_HEADER + data)
+        return
+    with open(undo_history_path(path), 'a+b') as f:
+        if not f.seek(0, os.SEEK_END):
+            data = UNDO_HISTORY_HEADER + data
+        else:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                data = b'\n' + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_undo_history(path, size, stats):
+    """Replay the first size bytes of the undo history of the board at path into (undo, redo) lists of command data
+
+    Returns None unless the last complete batch was written with the board
+    files as they are in stats, i.e. nothing has changed the board since.
+    A torn batch is dropped whole. Steps that cannot be kept across sessions
+    are None.
+    """
+    with open(undo_history_path(path), 'rb') as f:
+        lines = f.read(size).splitlines(True)
+    if not lines or lines[0] != UNDO_HISTORY_HEADER:
+        return None
+    undo, redo = [], []
+    batch, mark = None, None
+    for line in lines[1:]:
+        try:
+            entry = JSON_CODEC.loads(line)
+        except ValueError:
+            batch = None
+            continue
+        if entry[0] == 'begin':
+            batch = []
+            continue
+        if batch is None:
+            continue
+        if entry[0] != 'mark':
+            batch.append(entry)
+            continue
+        for kind, *args in batch:
+            if kind == 'push':
+                undo.append(args[0])
+                redo.clear()
+            elif kind == 'top' and undo:
+                undo[-1] = args[0]
+            elif kind == 'undo' and undo:
+                undo.pop()
+                redo.append(args[0])
+            elif kind == 'redo' and redo:
+                redo.pop()
+                undo.append(args[0])
+            elif kind == 'jump':
+                del undo[-args[0]:]
+                redo.append(None)
+            elif kind == 'clear':
+                undo.clear()
+                redo.clear()
+            elif kind == 'stacks':
+                undo, redo = args
+        batch, mark = None, entry[1]
+    if mark is None or tuple(tuple(stat) if stat else None for stat in mark) != stats:
+        return None
+    return undo, redo
+
+def merge_at_positions(items, placed):
+    """Return a copy of items with (position, item) pairs, in ascending position order, put back at those positions"""
+    merged, start = [], 0
+    for position, item in placed:
+        take = position - len(merged)
+        merged += items[start:start + take]
+        start += take
+        merged.append(item)
+    merged += items[start:]
+    return merged
+
+def replay_journal_records(snapshot, ops):
+    """Apply journalled edits to a {priority: [record, ...]} board, as TaskManager.apply_journal_op does"""
+    def find(task_id):
+        for priority, records in snapshot.items():
+            for index, record in enumerate(records):
+                if record[0] == task_id:
+                    return priority, index
+        return None
+
+    for op in ops:
+        kind = op['op']
+        if kind == 'clear':
+            for records in snapshot.values():
+                records[:] = [record for record in records if not record[2]]
+        elif kind == 'add':
+            record = entry_to_record(op['task'])
+            if find(record[0]) is None:
+                snapshot[op['box']].insert(op['index'], record)
+        elif kind == 'reinsert':
+            placed = [(position, tuple(record)) for position, record in op['tasks']]
+            snapshot[op['box']][:] = merge_at_positions(snapshot[op['box']], placed)
+        else:
+            found = find(op['id'])
+            if found is None:
+                continue
+            priority, index = found
+            task_id, text, done, created, accomplished = snapshot[priority][index]
+            if kind == 'delete':
+                del snapshot[priority][index]
+            elif kind == 'modify':
+                snapshot[priority][index] = (task_id, op['text'], done, created, accomplished)
+            elif kind in ('move', 'drag'):
+                snapshot[op['box']].insert(op['index'], snapshot[priority].pop(index))
+            elif kind == 'accomplish':
+                snapshot[priority][index] = (task_id, text, True, created, op['at'])
+            elif kind == 'restore':
+                snapshot[priority][index] = (task_id, text, False, created, None)
+    return snapshot
+
+def read_board(path, boxes):
+    """Read a whole board with its journal applied, returning the board and the journal edits
+
+    The edits are None without a journal that later saves can extend. A
+    journal that does not match the snapshot raises JournalMismatch.
+    """
+    snapshot = {priority: [] for priority in boxes}
+    for priority, records, progress in iter_board_chunks(path, boxes):
+        snapshot[priority].extend(records)
+    journal = None if is_sqlite_path(path) or is_sharded_path(path) else read_journal(path)
+    if journal is None:
+        return snapshot, None
+    ops, intact = journal
+    replay_journal_records(snapshot, ops)
+    return snapshot, ops if intact else None
+
+def watched_paths(path):
+    """The files that together hold a board: the file itself and its journal (or SQLite write-ahead log)
+
+    A sharded board is watched through its manifest, which every save replaces.
+    """
+    if is_sharded_path(path):
+        return (os.path.join(path, SHARD_MANIFEST),)
+    return (path, path + '-wal') if is_sqlite_path(path) else (path, journal_path(path))
+
+def board_file_stats(path):
+    """Cheap (size, mtime) signature of each file of a board, None for missing ones"""
+    stats = []
+    for name in watched_paths(path):
+        try:
+            stat = os.stat(name)
+        except OSError:
+            stats.append(None)
+            continue
+        if not stat.st_size and name.endswith('-wal'):
+            stats.append(None)  # Read-only SQLite readers leave an empty write-ahead log, which holds nothing
+        else:
+            stats.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(stats)
+
+def file_digest(name):
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(name, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def board_file_digests(path, stats, known=None):
+    """Content hashes of the files of a board, reusing the known (stats, digests) of files whose stats match"""
+    digests = []
+    for index, name in enumerate(watched_paths(path)):
+        if known is not None and known[0][index] == stats[index]:
+            digests.append(known[1][index])
+            continue
+        if stats[index] is None:
+            digests.append(None)
+            continue
+        try:
+            digests.append(file_digest(name))
+        except OSError:
+            digests.append(None)
+    return tuple(digests)
+
+def board_file_state(path):
+    """(stats, digests) of a board, what later checks for outside changes compare against"""
+    stats = board_file_stats(path)
+    return stats, board_file_digests(path, stats)
+
+def lock_file(path):
+    """Open path holding an exclusive lock on it, or return None if another open file holds one"""
+    f = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def unlock_file(f):
+    """Release a lock taken by lock_file"""
+    if fcntl is None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    f.close()
+
+def session_alive(directory, session):
+    """Whether a running instance holds the lock of a recovery session; the lock goes with the process"""
+    f = lock_file(os.path.join(directory, session + '.lock'))
+    if f is None:
+        return True
+    unlock_file(f)
+    return False
+
+class RecoveryStore:
+    """Rolling crash-recovery copies of the unsaved board of one session
+
+    Each version is a binary snapshot in the per-user recovery directory,
+    followed by a journal of the edits made since it, so most recovery
+    points only append a few lines. A small JSON index names the versions
+    and the board file they belong to; only the newest RECOVERY_VERSIONS
+    are kept. While the session has files, it holds the lock on its
+    ``.lock`` file, so other instances leave them alone. Writes run on the
+    board writer thread.
+    """
+    def __init__(self, directory=RECOVERY_DIR):
+        self.directory = directory
+        self.session = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{os.urandom(2).hex()}"
+        self.versions = []
+        self.sequence = 0
+        self.lock = None  # Open, locked .lock file of the session
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write_snapshot(self, snapshot, file_path):
+        """Start a new recovery version from a full snapshot, dropping the oldest ones"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.sequence += 1
+        name = f"{self.session}-{self.sequence}.dtb"
+        self.versions.append(name)
+        stale = self.versions[:-RECOVERY_VERSIONS]
+        del self.versions[:-RECOVERY_VERSIONS]
+        # Index first: a crash in between leaves a listed version missing, which loading skips,
+        # rather than a snapshot no index knows about
+        self.write_index(file_path)
+        write_atomic(self.path(name), encode_binary_board(snapshot))
+        self.remove_files(stale)
+
+    def append(self, lines, file_path):
+        """Journal edits on top of the newest recovery version"""
+        with open(self.path(self.versions[-1] + JOURNAL_SUFFIX), 'ab') as f:
+            f.write(b''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self.write_index(file_path)
+
+    def write_index(self, file_path):
+        if self.lock is None:
+            self.lock = lock_file(self.path(self.session + '.lock'))  # Taken before any index names the session
+        index = {
+            'session': self.session, 'pid': os.getpid(), 'file_path': file_path,
+            'time': time.time(), 'sequence': self.sequence, 'versions': self.versions,
+        }
+        write_atomic(self.path(self.session + '.json'), json.dumps(index, ensure_ascii=False).encode('utf-8'))
+
+    def adopt(self, index, name, file_path):
+        """Carry on from a restored session's version instead of writing the board out again"""
+        versions = index['versions']
+        self.remove_files(versions[versions.index(name) + 1:])  # Newer versions that failed to load
+        self.remove_files([self.session + '.json'])
+        self.unlock()
+        self.session = index['session']
+        self.sequence = index['sequence']
+        self.versions = versions[:versions.index(name) + 1]
+        self.write_index(file_path)
+
+    def discard(self):
+        """Remove this session's recovery files once the board is saved"""
+        self.remove_files(self.versions + [self.session + '.json'])
+        self.versions = []
+        self.unlock()
+
+    def unlock(self):
+        """Release and remove the session's lock file"""
+        if self.lock is not None:
+            unlock_file(self.lock)
+            self.lock = None
+        try:
+            os.remove(self.path(self.session + '.lock'))
+        except OSError:
+            pass
+
+    def remove_files(self, names):
+        for name in names:
+            for path in (self.path(name), self.path(name) + JOURNAL_SUFFIX):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def find_sessions(directory, exclude):
+        """Return the indexes of sessions left behind by other runs, newest first"""
+        sessions = []
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return sessions
+        for name in names:
+            if not name.endswith('.json') or name[:-5] == exclude:
+                continue
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if index.get('versions') and not session_alive(directory, index['session']):
+                sessions.append(index)
+        sessions.sort(key=lambda index: index['time'], reverse=True)
+        return sessions
+
+    @staticmethod
+    def load(directory, index):
+        """Return (version, snapshot, edits) for the newest readable version of a session, or None"""
+        for name in reversed(index['versions']):
+            path = os.path.join(directory, name)
+            try:
+                with open(path, 'rb') as f:
+                    snapshot = decode_binary_board(f.read())
+            except Exception:
+                continue  # Torn or missing version, fall back to an older one
+            try:
+                with open(path + JOURNAL_SUFFIX, 'rb') as f:
+                    ops = parse_journal_lines(f.readlines())
+            except OSError:
+                ops = []
+            return name, snapshot, ops
+        return None
+
+    @staticmethod
+    def remove_session(directory, index):
+        store = RecoveryStore(directory)
+        store.session, store.versions = index['session'], index['versions']
+        store.discard()
+
+class SnapshotCache:
+    """In-memory LRU of decoded boards, so reopening a recent file skips reading and parsing it
+
+    Entries are keyed by path and only used while the stats of the board and
+    its journal (size and mtime) still match, so a file changed since it was
+    cached is read again. The least recently used boards are dropped once
+    the cache holds more than max_tasks tasks.
+    """
+    def __init__(self, max_tasks=SNAPSHOT_CACHE_TASKS):
+        self.entries = {}  # path -> (snapshot, file state, journal ready, journal bytes, task count), oldest first
+        self.max_tasks = max_tasks
+        self.tasks = 0
+
+    def get(self, path, stats):
+        """Return the entry for path if it is still current, marking it as the most recently used"""
+        path = os.path.abspath(path)
+        entry = self.entries.get(path)
+        if entry is None or entry[1][0] != stats:
+            return None
+        self.entries[path] = self.entries.pop(path)
+        return entry
+
+    def put(self, path, snapshot, state, journal_ready, journal_bytes):
+        path = os.path.abspath(path)
+        self.discard(path)
+        count = sum(map(len, snapshot.values()))
+        if count > self.max_tasks:
+            return
+        self.entries[path] = (snapshot, state, journal_ready, journal_bytes, count)
+        self.tasks += count
+        while self.tasks > self.max_tasks:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, path):
+        entry = self.entries.pop(os.path.abspath(path), None)
+        if entry is not None:
+            self.tasks -= entry[4]
+
+class BoardWriter:
+    """Background thread that runs file writes in submission order
+
+    Jobs are callables doing the I/O (snapshot writes, journal appends), so
+    serialization happens off the UI thread. ``on_done(error)`` is called on
+    the writer thread after each job; it must not touch Tk.
+    """
+    def __init__(self):
+        self.pending = []
+        self.busy = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, job, on_done):
+        with self.condition:
+            self.pending.append((job, on_done))
+            self.condition.notify_all()
+
+    def flush(self):
+        """Block until every submitted snapshot has been written"""
+        with self.condition:
+            while self.pending or self.busy:
+                self.condition.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                job, on_done = self.pending.pop(0)
+                self.busy = True
+            error = None
+            try:
+                job()
+            except Exception as e:
+                error = e
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+            try:
+                on_done(error)
+            except Exception as e:
+                print(f"Error finishing background write: {e}")
+
+class VirtualTaskBox(tk.Canvas):
+    """Listbox look-alike that draws only the visible rows of a task list
+
+    Rows are read from the model on demand through ``source``, so the widget
+    keeps no copy of the task strings and redraw cost depends only on the
+    visible height. It implements the subset of the Listbox API TaskManager
+    uses; insert and delete only keep the selection in step with the model.
+    A canvas has no exported selection to clear its siblings the way
+    Listboxes do, so ``on_select`` is called with the box when it selects a row.
+    """
+    def __init__(self, master, source, height=10, yscrollcommand=None, on_select=None, **kw):
+        self.font = tkfont.nametofont('TkDefaultFont')
+        self.row_height = self.font.metrics('linespace') + 2
+        super().__init__(master, height=height * self.row_height, background='white',
+                         highlightthickness=1, takefocus=1, **kw)
+        self.source = source
+        self.yscrollcommand = yscrollcommand
+        self.on_select = on_select
+        self.top = 0  # Index of the first visible row
+        self.selected = None
+        self._redraw_pending = False
+
+        # Selection and navigation run before the instance bindings (drag, Return)
+        self.bindtags(('VirtualTaskBox',) + self.bindtags())
+        self.bind_class('VirtualTaskBox', '<ButtonPress-1>', VirtualTaskBox._on_click)
+        self.bind_class('VirtualTaskBox', '<Up>', lambda e: e.widget._step(-1))
+        self.bind_class('VirtualTaskBox', '<Down>', lambda e: e.widget._step(1))
+        # Tk would match Ctrl+Shift+Up/Down to the bindings above; these more specific ones leave
+        # the selection alone so Move Up/Down on the root move the selected task
+        self.bind_class('VirtualTaskBox', '<Control-Up>', lambda e: None)
+        self.bind_class('VirtualTaskBox', '<Control-Down>', lambda e: None)
+        self.bind_class('VirtualTaskBox', '<Prior>', lambda e: e.widget._step(-e.widget.visible_rows()))
+        self.bind_class('VirtualTaskBox', '<Next>', lambda e: e.widget._step(e.widget.visible_rows()))
+        self.bind_class('VirtualTaskBox', '<Home>', lambda e: e.widget._step(-e.widget.size()))
+        self.bind_class('VirtualTaskBox', '<End>', lambda e: e.widget._step(e.widget.size()))
+        self.bind_class('VirtualTaskBox', '<MouseWheel>',
+                        lambda e: e.widget.yview('scroll', -3 if e.delta > 0 else 3, 'units'))
+        self.bind_class('VirtualTaskBox', '<Button-4>', lambda e: e.widget.yview('scroll', -3, 'units'))
+        self.bind_class('VirtualTaskBox', '<Button-5>', lambda e: e.widget.yview('scroll', 3, 'units'))
+        self.bind_class('VirtualTaskBox', '<Configure>', lambda e: e.widget.schedule_redraw())
+
+    # Listbox API used by TaskManager
+
+    def size(self):
+        return len(self.source())
+
+    def get(self, index):
+        return str(self.source()[self._index(index)])
+
+    def insert(self, index, *items):
+        index = self.size() - len(items) if index == tk.END else int(index)
+        if self.selected is not None and self.selected >= index:
+            self.selected += len(items)
+        self.schedule_redraw()
+
+    def delete(self, first, last=None):
+        first = self._index(first)
+        last = first if last is None else (float('inf') if last == tk.END else int(last))
+        if self.selected is not None:
+            if first <= self.selected <= last:
+                self.selected = None
+            elif self.selected > last:
+                self.selected -= last - first + 1
+        self.schedule_redraw()
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_set(self, first, last=None):
+        self.selected = self._index(first)
+        self.schedule_redraw()
+        if self.on_select:
+            self.on_select(self)
+
+    def selection_clear(self, first=None, last=None):
+        self.selected = None
+        self.schedule_redraw()
+
+    def selection_includes(self, index):
+        return self.selected == self._index(index)
+
+    def see(self, index):
+        index = self._index(index)
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible_rows():
+            self.top = index - self.visible_rows() + 1
+        self.schedule_redraw()
+
+    def nearest(self, y):
+        return max(min(self.top + int(y) // self.row_height, self.size() - 1), 0)
+
+    def activate(self, index):
+        pass
+
+    def yview(self, *args):
+        """Scrollbar protocol: report the visible fraction or scroll by 'moveto'/'scroll'"""
+        total = self.size()
+        if not args:
+            if not total:
+                return 0.0, 1.0
+            return self.top / total, min((self.top + self.visible_rows()) / total, 1.0)
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= max(self.visible_rows() - 1, 1)
+            self.top += amount
+        self.schedule_redraw()
+
+    # Rendering
+
+    def visible_rows(self):
+        return max(self.winfo_height() // self.row_height, 1)
+
+    def schedule_redraw(self):
+        """Redraw once when Tk is idle, however many changes arrive before then"""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def redraw(self):
+        self._redraw_pending = False
+        rows = self.source()
+        self.top = max(min(self.top, len(rows) - self.visible_rows()), 0)
+        width = self.winfo_width()
+        tk.Canvas.delete(self, 'all')
+        for offset, index in enumerate(range(self.top, min(self.top + self.visible_rows() + 1, len(rows)))):
+            y = offset * self.row_height
+            fill = 'black'
+            if index == self.selected:
+                self.create_rectangle(0, y, width, y + self.row_height, fill='#0078d7', outline='')
+                fill = 'white'
+            self.create_text(4, y + 1, text=str(rows[index]), anchor='nw', font=self.font, fill=fill)
+        if self.yscrollcommand:
+            self.yscrollcommand(*self.yview())
+
+    def _index(self, index):
+        return self.size() if index == tk.END else int(index)
+
+    def _on_click(self, event):
+        self.focus_set()
+        index = self.nearest(event.y)
+        if index < self.size():
+            self.selection_set(index)
+
+    def _step(self, amount):
+        if self.size():
+            current = self.top if self.selected is None else self.selected
+            index = max(min(current + amount, self.size() - 1), 0)
+            self.selection_set(index)
+            self.see(index)
+
+PERSISTENT_LEAF = 64  # Items per leaf of a PersistentList
+PERSISTENT_FANOUT = 32  # Children per inner node of a PersistentList
+
+def _tree_size(node, height):
+    return len(node) if height == 0 else (node[1][-1] if node[1] else 0)
+
+def _tree_node(children, height):
+    """Make an inner node over children of the given height"""
+    children = tuple(children)
+    return children, tuple(itertools.accumulate(_tree_size(child, height) for child in children))
+
+def _tree_find(ends, index):
+    """Return (child, offset within it) for an item index of an inner node"""
+    child = min(bisect.bisect_right(ends, index), len(ends) - 1)
+    return child, index - (ends[child - 1] if child else 0)
+
+def _tree_leaves(node, height):
+    if height == 0:
+        yield node
+    else:
+        for child in node[0]:
+            yield from _tree_leaves(child, height - 1)
+
+def _tree_set(node, height, index, item):
+    if height == 0:
+        return node[:index] + (item,) + node[index + 1:]
+    children, ends = node
+    child, offset = _tree_find(ends, index)
+    return children[:child] + (_tree_set(children[child], height - 1, offset, item),) + children[child + 1:], ends
+
+def _tree_insert(node, height, index, item):
+    """Insert into a subtree, returning one node, or two when it had to split"""
+    if height == 0:
+        node = node[:index] + (item,) + node[index:]
+        if len(node) <= PERSISTENT_LEAF:
+            return (node,)
+        half = len(node) // 2
+        return node[:half], node[half:]
+    children, ends = node
+    child, offset = _tree_find(ends, index)
+    children = children[:child] + _tree_insert(children[child], height - 1, offset, item) + children[child + 1:]
+    if len(children) <= PERSISTENT_FANOUT:
+        return (_tree_node(children, height - 1),)
+    half = len(children) // 2
+    return _tree_node(children[:half], height - 1), _tree_node(children[half:], height - 1)
+
+def _tree_delete(node, height, index):
+    if height == 0:
+        return node[:index] + node[index + 1:]
+    children, ends = node
+    child, offset = _tree_find(ends, index)
+    replacement = _tree_delete(children[child], height - 1, offset)
+    # Empty children are dropped; nodes are otherwise left to shrink rather than rebalanced
+    kept = (replacement,) if _tree_size(replacement, height - 1) else ()
+    return _tree_node(children[:child] + kept + children[child + 1:], height - 1)
+
+class PersistentList:
+    """An immutable list stored as a tree of short tuples, used for undo checkpoints of the board
+
+    set, insert and delete return a new list that shares every node off the
+    edited path with the old one, so an edit copies O(log n) items and
+    keeping the old version costs nothing more. Leaves are tuples of items,
+    inner nodes (children, ends) pairs, ends holding running item counts.
+    """
+    __slots__ = ('root', 'height')
+
+    def __init__(self, items=(), root=None, height=0):
+        if root is None:
+            items = tuple(items)
+            nodes = [items[start:start + PERSISTENT_LEAF] for start in range(0, len(items), PERSISTENT_LEAF)] or [()]
+            while len(nodes) > 1:
+                nodes = [_tree_node(nodes[start:start + PERSISTENT_FANOUT], height)
+                         for start in range(0, len(nodes), PERSISTENT_FANOUT)]
+                height += 1
+            root = nodes[0]
+        self.root = root
+        self.height = height
+
+    def __len__(self):
+        return _tree_size(self.root, self.height)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.leaves())
+
+    def leaves(self):
+        """The leaf tuples in order; a leaf shared by two versions is the same object in both"""
+        return _tree_leaves(self.root, self.height)
+
+    def __getitem__(self, index):
+        node = self.root
+        for _ in range(self.height):
+            children, ends = node
+            child, index = _tree_find(ends, index)
+            node = children[child]
+        return node[index]
+
+    def set(self, index, item):
+        return PersistentList(root=_tree_set(self.root, self.height, index, item), height=self.height)
+
+    def insert(self, index, item):
+        nodes = _tree_insert(self.root, self.height, index, item)
+        if len(nodes) == 1:
+            return PersistentList(root=nodes[0], height=self.height)
+        return PersistentList(root=_tree_node(nodes, self.height), height=self.height + 1)
+
+    def delete(self, index):
+        root, height = _tree_delete(self.root, self.height, index), self.height
+        while height and len(root[0]) <= 1:
+            root, height = (root[0][0] if root[0] else ()), height - 1  # Drop roots with a single child
+        return PersistentList(root=root, height=height)
+
+UNDO_ENTRY_BYTES = 120  # Rough size of a command object and its small fields
+TASK_BYTES = 140  # Rough size of a Task object and its times, text excluded
+CHECKPOINT_BYTES = 8 * (PERSISTENT_LEAF + 3 * PERSISTENT_FANOUT)  # Part of a checkpoint not shared with the next
+
+def task_footprint(task):
+    """Approximate memory a task holds once only the undo history refers to it"""
+    return TASK_BYTES + sys.getsizeof(task.text)
+
+class Command:
+    """A reversible board edit, kept on the undo stack
+
+    ``apply`` makes the edit and ``revert`` takes it back, both through the
+    TaskManager model primitives; each journals what it changes and returns
+    the view changes to render. A command keeps only what its inverse needs
+    (a removed task, the previous text or position), never a copy of the board.
+    """
+    checkpoint = None  # The board before the edit, kept while undo checkpoints are on
+    size = 0  # footprint() when the command last moved to a stack
+    stamp = 0.0  # time.monotonic() when the command was done, or last had an edit merged into it
+    kind = None  # Name in the undo history file, None for commands not kept across sessions
+
+    def apply(self, app):
+        raise NotImplementedError
+
+    def revert(self, app):
+        raise NotImplementedError
+
+    def footprint(self, app):
+        """Approximate bytes the command keeps alive that the board does not, for the undo budget"""
+        return UNDO_ENTRY_BYTES + (CHECKPOINT_BYTES if self.checkpoint is not None else 0)
+
+    def merge(self, command, app):
+        """Return one command that undoes this one and command, just done after it, together, or None"""
+        return None
+
+    def to_data(self):
+        """The command as it is now, as a JSON-friendly list for the undo history file, or None"""
+        return None
+
+    @classmethod
+    def from_data(cls, *args):
+        """Rebuild a command from the arguments to_data saved after its kind"""
+        return cls(*args)
+
+class AddTask(Command):
+    """Put a task into a box at a position"""
+    kind = 'add'
+
+    def __init__(self, box, index, task):
+        self.box = box
+        self.index = index
+        self.task = task
+
+    def apply(self, app):
+        self.index = app.insert_task(self.box, self.index, self.task)
+        app.journal_op('add', box=self.box, index=self.index, task=self.task.to_dict())
+        return [('insert', self.box, self.index, str(self.task))]
+
+    def revert(self, app):
+        self.box, self.index = app.locate_task(self.task.id)
+        self.task = app.pop_task(self.box, self.index)  # A checkpoint restore may have replaced the object
+        app.journal_op('delete', id=self.task.id)
+        return [('delete', self.box, self.index, None)]
+
+    def footprint(self, app):
+        size = Command.footprint(self, app)
+        return size if self.task.id in app.task_index else size + task_footprint(self.task)
+
+    def to_data(self):
+        return [self.kind, self.box, self.index, self.task.record()]
+
+    @classmethod
+    def from_data(cls, box, index, record):
+        return cls(box, index, Task.from_record(record, box))
+
+class DeleteTask(AddTask):
+    """Take the task at (box, index) out of the board; undone by putting it back there"""
+    kind = 'delete'
+    apply, revert = AddTask.revert, AddTask.apply
+
+class ModifyTask(Command):
+    """Change the text of a task, keeping the previous text to swap back"""
+    kind = 'modify'
+
+    def __init__(self, task_id, text):
+        self.task_id = task_id
+        self.text = text
+
+    def apply(self, app):
+        task = app.get_task(self.task_id)
+        text = task.text
+        app.set_task_text(task, self.text)
+        self.text = text
+        app.journal_op('modify', id=task.id, text=task.text)
+        return [('update', *app.locate_task(task.id), str(task))]
+
+    revert = apply
+
+    def footprint(self, app):
+        return Command.footprint(self, app) + sys.getsizeof(self.text)
+
+    def merge(self, command, app):
+        # Undone together straight back to the text before the first edit
+        return self if isinstance(command, ModifyTask) and command.task_id == self.task_id else None
+
+    def to_data(self):
+        return [self.kind, self.task_id, self.text]
+
+class SwapTasks(Command):
+    """Swap two neighbouring tasks in a box, as Move Up and Move Down do, moving the task at first to second"""
+    kind = 'swap'
+
+    def __init__(self, box, first, second):
+        self.box = box
+        self.first = first
+        self.second = second
+        self.moved = None  # Id of the task now at second
+
+    def apply(self, app):
+        app.swap_tasks(self.box, self.first, self.second)
+        self.moved = app.tasks[self.box][self.second].id
+        upper = min(self.first, self.second)
+        app.journal_op('move', id=app.tasks[self.box][upper].id, box=self.box, index=upper)
+        return app.row_updates(self.box, self.first, self.second)
+
+    revert = apply
+
+    def merge(self, command, app):
+        # Moving the task on becomes a single move back to where it started
+        return MoveTask(self.moved, self.box, self.first).merge(command, app)
+
+    def to_data(self):
+        return [self.kind, self.box, self.first, self.second]
+
+class MoveTask(Command):
+    """Move a task to a position in any box, keeping where it came from to move it back"""
+    kind = 'move'
+
+    def __init__(self, task_id, box, index):
+        self.task_id = task_id
+        self.box = box
+        self.index = index
+
+    def apply(self, app):
+        box, index = app.locate_task(self.task_id)
+        task = app.pop_task(box, index)
+        target = app.insert_task(self.box, self.index, task)
+        app.journal_op('move', id=task.id, box=self.box, index=target)
+        changes = [('delete', box, index, None), ('insert', self.box, target, str(task))]
+        self.box, self.index = box, index
+        return changes
+
+    revert = apply
+
+    def merge(self, command, app):
+        if isinstance(command, SwapTasks):
+            task_id = command.moved
+        elif isinstance(command, MoveTask):
+            task_id = command.task_id
+        else:
+            return None
+        return self if task_id == self.task_id else None  # Still moves the task back to where it started
+
+    def to_data(self):
+        return [self.kind, self.task_id, self.box, self.index]
+
+class SetTaskDone(Command):
+    """Accomplish or restore a task, keeping its previous state and accomplished time to swap back"""
+    kind = 'done'
+
+    def __init__(self, task_id, done):
+        self.task_id = task_id
+        self.done = done
+        self.accomplished = None  # Time to reuse when a restore is undone
+
+    def apply(self, app):
+        task = app.get_task(self.task_id)
+        previous = task.done, task.accomplished
+        app.set_task_done(task, self.done, self.accomplished)
+        if self.done:
+            app.journal_op('accomplish', id=task.id, at=task.accomplished)
+        else:
+            app.journal_op('restore', id=task.id)
+        self.done, self.accomplished = previous
+        return [('update', *app.locate_task(task.id), str(task))]
+
+    revert = apply
+
+    def to_data(self):
+        return [self.kind, self.task_id, self.done, self.accomplished]
+
+    @classmethod
+    def from_data(cls, task_id, done, accomplished):
+        command = cls(task_id, done)
+        command.accomplished = accomplished
+        return command
+
+class CommandBatch(Command):
+    """Several commands applied in order and reverted in reverse, one undo step"""
+    kind = 'batch'
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    def apply(self, app):
+        changes = []
+        for command in self.commands:
+            changes += command.apply(app)
+        return changes
+
+    def revert(self, app):
+        changes = []
+        for command in reversed(self.commands):
+            changes += command.revert(app)
+        return changes
+
+    def footprint(self, app):
+        return Command.footprint(self, app) + sum(command.footprint(app) for command in self.commands)
+
+    def to_data(self):
+        return [self.kind, [command.to_data() for command in self.commands]]
+
+    @classmethod
+    def from_data(cls, commands):
+        return cls([command_from_data(data) for data in commands])
+
+class ClearAccomplished(Command):
+    """Drop every accomplished task, keeping only the removed tasks and their positions to merge back"""
+    kind = 'clear'
+
+    def __init__(self):
+        self.removed = None
+
+    def apply(self, app):
+        self.removed = app.remove_accomplished()
+        app.journal_op('clear')
+        return [('box', priority, None, None) for priority in self.removed]
+
+    def revert(self, app):
+        for priority, placed in self.removed.items():
+            app.merge_tasks(priority, placed)
+            app.journal_op('reinsert', box=priority, tasks=[(position, task.record()) for position, task in placed])
+        changes = [('box', priority, None, None) for priority in self.removed]
+        self.removed = None
+        return changes
+
+    def footprint(self, app):
+        size = Command.footprint(self, app)
+        for placed in (self.removed or {}).values():
+            size += sum(task_footprint(task) for position, task in placed) + 72 * len(placed)  # Pair tuples
+        return size
+
+    def to_data(self):
+        if self.removed is None:
+            return [self.kind, None]
+        return [self.kind, {
+            priority: [(position, task.record()) for position, task in placed]
+            for priority, placed in self.removed.items()
+        }]
+
+    @classmethod
+    def from_data(cls, removed):
+        command = cls()
+        if removed is not None:
+            command.removed = {
+                priority: [(position, Task.from_record(record, priority)) for position, record in placed]
+                for priority, placed in removed.items()
+            }
+        return command
+
+class ReplaceBoard(Command):
+    """Swap the whole board, as New and Open do, with the board it replaced
+
+    The replaced board is kept as it was, with its file; applying the
+    command again swaps the two back. A journal cannot express the swap, so
+    the next save writes a full snapshot.
+    """
+
+    def __init__(self, board):
+        self.board = board  # TaskManager.board_state() of the board not on screen
+
+    def apply(self, app):
+        board = app.board_state()
+        app.tasks, app.file_path, app.file_state, app.history_pending = self.board
+        self.board = board
+        app.rebuild_task_index()
+        app.recount_tasks()
+        app.journal_ops = []
+        app.journal_ready = False
+        app.history_file = None  # The history file of the board now on screen is rewritten from the stacks
+        app.recovery_stale = True
+        app.external_change = False
+        return [('box', priority, None, None) for priority in app.tasks]
+
+    revert = apply
+
+    def footprint(self, app):
+        return Command.footprint(self, app) + sum(
+            task_footprint(task) + 8 for tasks in self.board[0].values() for task in tasks
+        )
+
+class BoardCheckpoint(Command):
+    """Swap the tasks on the board with a checkpoint of them, the undo step of a jump back through history"""
+
+    def __init__(self, board):
+        self.board = board
+
+    def apply(self, app):
+        board = app.take_checkpoint()
+        app.restore_checkpoint(self.board)
+        self.board = board
+        return [('box', priority, None, None) for priority in app.tasks]
+
+    revert = apply
+
+    def footprint(self, app):
+        # Only leaves the board no longer has are held by the checkpoint alone
+        size = Command.footprint(self, app)
+        current = app.take_checkpoint()
+        for priority, records in self.board.items():
+            live = {id(leaf) for leaf in current[priority].leaves()}
+            for leaf in records.leaves():
+                if id(leaf) not in live:
+                    size += 8 * PERSISTENT_LEAF + sum(TASK_BYTES + sys.getsizeof(record[1]) for record in leaf)
+        return size
+
+COMMAND_KINDS = {
+    command.kind: command
+    for command in (AddTask, DeleteTask, ModifyTask, SwapTasks, MoveTask, SetTaskDone, CommandBatch, ClearAccomplished)
+}
+
+def command_from_data(data):
+    """Rebuild a command from what its to_data returned"""
+    kind, *args = data
+    return COMMAND_KINDS[kind].from_data(*args)
+
 class TaskManager:
     def __init__(self):
         self.root = TkinterDnD.Tk()
@@ -45,12 +2019,31 @@ class TaskManager:
         self.task_count = 0
         self.accomplished_count = 0  # Initialize accomplished task count
         
-        # Initialize undo/redo stacks
+        # Initialize undo/redo stacks of Command objects
         self.undo_stack = []
         self.redo_stack = []
+        self.replaced_board = None  # Board an open in progress replaces, for undo
+        self.replaced_edits = None  # Its unsaved-edit state, put back if the open fails
+        self.history_bytes = 0  # Approximate memory held by both stacks, kept within the undo budget
+        # Undo history file: stack changes not yet written, the board whose file they extend and its size,
+        # and (file_path, size, stats) of saved history not read in yet
+        self.history_ops = []
+        self.history_file = None
+        self.history_disk_bytes = 0
+        self.history_pending = None
 
         # Initialize file path
         self.file_path = None
+
+        # Per-user settings; 'workspace' is the folder of the daily workspace, if one is in use
+        self.settings = load_settings()
+        self.rollover_job = None
+        self.snapshot_cache = SnapshotCache()
+        self.rollover_day = None  # Day whose board the armed midnight rollover moves on from
+        self.pending_rollover = False  # Roll the board being opened over to today once it has loaded
+
+        # Draw task boxes as virtualized views instead of Listboxes
+        self.use_virtual_boxes = False
         
         # Weather API settings
         self.base_url = "http://api.openweathermap.org/data/2.5/weather?"
@@ -58,10 +2051,41 @@ class TaskManager:
         self.city = 'Shanghai'
         
         # Auto-save settings
-        self.auto_save_interval = 300  # 5 minutes in seconds
+        self.auto_save_delay = 10  # Seconds of quiet after the last edit before saving
+        self.auto_save_interval = 300  # Longest an edit may stay unsaved while editing continues
         self.last_save_time = None
         self.last_edit_time = None
+        self.first_unsaved_edit = None
+        self.is_modified = False
         self.auto_save_enabled = True
+        self.auto_save_job = None
+        self.next_auto_save = None
+        self.edit_generation = 0  # Bumped on every edit, so a finished save knows if it is still current
+        self.writer = BoardWriter()
+        # (callback, args) posted by background threads, run on the UI thread; Tk must not be called from them
+        self.completions = queue.Queue()
+        self.closed = False  # The window is gone and mainloop has returned
+
+        # Streaming open: chunks from the loader thread, None when no board is loading
+        self.load_queue = None
+
+        # Append-only journal: edits not yet written, and the journal size on disk
+        self.journal_ops = []
+        self.journal_bytes = 0
+        self.journal_ready = False  # The file at file_path has a journal matching its snapshot
+
+        # Outside changes: (stats, digests) of the file as last loaded or saved, and whether it differs now
+        self.file_state = None
+        self.external_change = False
+        self.pending_writes = 0
+        self.watch_busy = False
+
+        # Crash recovery: edits not yet in the recovery snapshot, and its journal size
+        self.recovery = RecoveryStore()
+        self.recovery_ops = []
+        self.recovery_bytes = 0
+        self.recovery_stale = True  # The next recovery point must be a full snapshot
+        self.recovery_job = None
         
         # Create main containers
         self.create_menu_bar()
@@ -78,6 +2102,19 @@ class TaskManager:
 
         # Dictionary to store tasks
         self.tasks = {f"Priority {i}": [] for i in range(1, 5)}
+        # Task id -> (priority, position) index for O(1) lookups
+        self.task_index = {}
+        # Per-box [total, accomplished] counters, maintained as deltas
+        self.box_counts = {priority: [0, 0] for priority in self.tasks}
+        # Structurally shared copy of the boxes for undo checkpoints, None while they are off
+        self.shared_board = None
+        self.shared_stale = set()  # Boxes replaced in bulk, rebuilt at the next checkpoint
+        self.set_undo_checkpoints(bool(self.settings.get('undo_checkpoints')))
+
+        # Render scheduler: queued view changes are flushed once per idle cycle
+        self.pending_changes = []
+        self.pending_selection = None
+        self.render_job = None
 
         # Bind keyboard shortcuts
         self.root.bind_all('<Control-o>', lambda e: self.open_file())  # Bind Ctrl+O for open
@@ -90,13 +2127,33 @@ class TaskManager:
         self.root.bind('<Control-z>', lambda e: self.undo())  # Bind Ctrl+Z for undo
         self.root.bind('<Control-y>', lambda e: self.redo())  # Bind Ctrl+Y for redo
         self.task_input.bind('<Return>', lambda e: self.prompt_priority())  # Bind Enter in input field
-        for listbox in self.task_boxes.values():
-            listbox.bind('<Return>', lambda e: self.accomplish_task())  # Bind Enter in task boxes
-            listbox.bind('<Double-Return>', lambda e: self.restore_task())  # Bind Double Enter in task boxes
 
-        # Start auto-save thread
-        self.auto_save_thread = threading.Thread(target=self.auto_save_loop, daemon=True)
-        self.auto_save_thread.start()
+        restored = self.offer_recovery()
+        if self.settings.get('workspace'):
+            if not restored:
+                self.open_daily_board()
+            elif self.is_past_daily_board(self.file_path):
+                self.roll_over_day()
+            self.schedule_rollover()
+        self.root.after(WATCH_INTERVAL_MS, self.watch_file)
+        self.root.after(COMPLETION_POLL_MS, self.poll_completions)
+
+    def post(self, callback, *args):
+        """Have the UI thread call callback(*args); safe from any thread"""
+        self.completions.put((callback, args))
+
+    def poll_completions(self):
+        self.run_completions()
+        self.root.after(COMPLETION_POLL_MS, self.poll_completions)
+
+    def run_completions(self):
+        """Run the callbacks background threads have posted so far"""
+        while True:
+            try:
+                callback, args = self.completions.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
 
     def create_menu_bar(self):
         menubar = tk.Menu(self.root)
@@ -107,8 +2164,18 @@ class TaskManager:
         menubar.add_cascade(label="File", menu=file_menu, underline=0)  # Set mnemonic for 'File' menu
         file_menu.add_command(label="New", command=self.new_file)
         file_menu.add_command(label="Open", command=self.open_file, accelerator="Ctrl+O")
+        self.recent_menu = tk.Menu(file_menu, tearoff=0)
+        file_menu.add_cascade(label="Recent Files", menu=self.recent_menu)
+        self.update_recent_menu()
         file_menu.add_command(label="Save", command=self.save_tasks, accelerator="Ctrl+S")
         file_menu.add_command(label="Save As", command=self.save_as)
+        self.daily_workspace_var = tk.BooleanVar(value=bool(self.settings.get('workspace')))
+        file_menu.add_checkbutton(label="Daily Workspace", variable=self.daily_workspace_var,
+                                  command=self.toggle_daily_workspace)
+        file_menu.add_command(label="History", command=self.show_history)
+        self.compact_json_var = tk.BooleanVar(value=bool(self.settings.get('compact_json')))
+        file_menu.add_checkbutton(label="Compact JSON", variable=self.compact_json_var,
+                                  command=self.toggle_compact_json)
         file_menu.add_separator()
         file_menu.add_command(label="Export to PDF", command=self.export_pdf)
         file_menu.add_separator()
@@ -119,8 +2186,20 @@ class TaskManager:
         menubar.add_cascade(label="Edit", menu=edit_menu)
         edit_menu.add_command(label="Undo", command=self.undo, accelerator="Ctrl+Z")
         edit_menu.add_command(label="Redo", command=self.redo, accelerator="Ctrl+Y")
+        edit_menu.add_command(label="Undo Several...", command=self.undo_several)
+        self.undo_checkpoints_var = tk.BooleanVar(value=bool(self.settings.get('undo_checkpoints')))
+        edit_menu.add_checkbutton(label="Undo Checkpoints", variable=self.undo_checkpoints_var,
+                                  command=self.toggle_undo_checkpoints)
+        edit_menu.add_command(label="Undo Budget...", command=self.set_undo_budget)
         edit_menu.add_command(label="CLA", command=self.clear_all_accomplished, accelerator="Ctrl+Shift+L")
 
+        # View Menu
+        view_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="View", menu=view_menu)
+        self.virtual_boxes_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Virtualized Task Boxes", variable=self.virtual_boxes_var,
+                                  command=lambda: self.set_virtual_boxes(self.virtual_boxes_var.get()))
+
         # Help Menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
@@ -147,9 +2226,13 @@ class TaskManager:
             btn.pack(side='left', padx=5)
 
     def create_task_boxes(self):
-        # Create frame for task boxes
+        # Create frame for task boxes, keeping its place above the action buttons when rebuilt
         task_frame = ttk.Frame(self.root)
-        task_frame.pack(expand=True, fill='both', padx=10, pady=10)
+        if hasattr(self, 'action_frame'):
+            task_frame.pack(expand=True, fill='both', padx=10, pady=10, before=self.action_frame)
+        else:
+            task_frame.pack(expand=True, fill='both', padx=10, pady=10)
+        self.task_frame = task_frame
 
         # Configure grid
         task_frame.grid_columnconfigure(0, weight=1)
@@ -165,6 +2248,7 @@ class TaskManager:
 
         # Create task boxes
         self.task_boxes = {}
+        self.task_frames = {}
         for i in range(1, 5):
             row = (i-1) // 2
             col = (i-1) % 2
@@ -172,7 +2256,15 @@ class TaskManager:
             frame = ttk.LabelFrame(task_frame, text=self.priority_labels[i])
             frame.grid(row=row, column=col, padx=5, pady=5, sticky='nsew')
             
-            listbox = tk.Listbox(frame, height=10, selectmode=tk.SINGLE)
+            if self.use_virtual_boxes:
+                scrollbar = ttk.Scrollbar(frame, orient='vertical')
+                listbox = VirtualTaskBox(frame, lambda p=f"Priority {i}": self.tasks[p],
+                                         height=10, yscrollcommand=scrollbar.set,
+                                         on_select=self.clear_other_selections)
+                scrollbar.config(command=listbox.yview)
+                scrollbar.pack(side='right', fill='y', pady=5)
+            else:
+                listbox = tk.Listbox(frame, height=10, selectmode=tk.SINGLE)
             listbox.pack(expand=True, fill='both', padx=5, pady=5)
             
             # Enable drag and drop for each listbox
@@ -180,13 +2272,35 @@ class TaskManager:
             listbox.bind('<ButtonPress-1>', self.on_drag_start)  # Left mouse button
             listbox.bind('<B1-Motion>', self.on_drag_motion)     # Left mouse button motion
             listbox.bind('<ButtonRelease-1>', self.on_drag_stop) # Left mouse button release
+            listbox.bind('<Return>', lambda e: self.accomplish_task())  # Bind Enter in task boxes
+            listbox.bind('<Double-Return>', lambda e: self.restore_task())  # Bind Double Enter in task boxes
             
             self.task_boxes[f"Priority {i}"] = listbox
+            self.task_frames[f"Priority {i}"] = frame
+
+    def clear_other_selections(self, selected_box):
+        """Keep a single selected task across the boxes, as exported Listbox selections do"""
+        for listbox in self.task_boxes.values():
+            if listbox is not selected_box and listbox.curselection():
+                listbox.selection_clear(0, tk.END)
+
+    def set_virtual_boxes(self, enabled):
+        """Switch between Listbox and virtualized task boxes, rebuilding the views"""
+        self.use_virtual_boxes = enabled
+        self.virtual_boxes_var.set(enabled)
+        self.task_frame.destroy()
+        self.create_task_boxes()
+        self.refresh_task_boxes()
 
     def on_drag_start(self, event):
+        if self.is_loading():
+            return
+        # Bring the listboxes up to date before reading their selection
+        self.flush_render()
         widget = event.widget
         if widget.curselection():
-            self.drag_data = widget.get(widget.curselection())
+            source_priority = [key for key, value in self.task_boxes.items() if value == widget][0]
+            self.drag_data = self.tasks[source_priority][widget.curselection()[0]].id
             self.drag_source = widget
             self.drag_source_index = widget.curselection()[0]
             widget.config(cursor="hand2")  # Change cursor to indicate dragging
@@ -196,22 +2310,12 @@ class TaskManager:
 
     def on_drag_stop(self, event):
         target_listbox = event.widget
-        if self.drag_data and self.drag_source != target_listbox:
-            # Remove from source
-            source_priority = [key for key, value in self.task_boxes.items() if value == self.drag_source][0]
-            self.tasks[source_priority].remove(self.drag_data)
-            self.drag_source.delete(self.drag_source_index)
-
-            # Add to target
+        if self.drag_data is not None and self.drag_source != target_listbox:
+            # Move from source to the end of the target
             target_priority = [key for key, value in self.task_boxes.items() if value == target_listbox][0]
-            self.tasks[target_priority].append(self.drag_data)
-            target_listbox.insert(tk.END, self.drag_data)
-
-            # Update task count
-            self.task_count = sum(len(tasks) for tasks in self.tasks.values())
-            self.counter_label.config(text=f"Total Tasks: {self.task_count}")
+            self.execute(MoveTask(self.drag_data, target_priority, len(self.tasks[target_priority])))
 
-            print(f"Dropped: {self.drag_data} to {target_priority}")
+            print(f"Dropped: {self.get_task(self.drag_data)} to {target_priority}")
         event.widget.config(cursor="")
         self.drag_data = None
         self.drag_source = None
@@ -223,7 +2327,7 @@ class TaskManager:
 
     def create_action_buttons(self):
         # Create frame for action buttons
-        action_frame = ttk.Frame(self.root)
+        action_frame = self.action_frame = ttk.Frame(self.root)
         action_frame.pack(pady=(0, 40), padx=10, fill='x', side='bottom')
 
         # Add action buttons
@@ -251,6 +2355,17 @@ class TaskManager:
         self.last_edit_label = ttk.Label(self.status_bar, text="Last edit: Never")
         self.last_edit_label.pack(side='left', padx=5)
         
+        # Status label for the pending auto-save
+        self.next_save_label = ttk.Label(self.status_bar, text="Next save: Idle")
+        self.next_save_label.pack(side='left', padx=5)
+        
+        # Status label for the memory held by the undo history
+        self.undo_label = ttk.Label(self.status_bar, text="Undo: 0 steps, 0.0 MB")
+        self.undo_label.pack(side='left', padx=5)
+        
+        # Progress of a board that is still being opened, shown only while loading
+        self.load_progress = ttk.Progressbar(self.status_bar, length=150, maximum=1.0)
+        
         # Toggle auto-save button
         self.toggle_auto_save_btn = ttk.Button(
             self.status_bar,
@@ -264,11 +2379,434 @@ class TaskManager:
         self.auto_save_enabled = not self.auto_save_enabled
         status = "Enabled" if self.auto_save_enabled else "Disabled"
         self.auto_save_label.config(text=f"Auto-save: {status}")
+        self.schedule_auto_save()
+        self.update_status_bar()
 
     def update_status_bar(self):
         """Update status bar with latest information"""
-        status_text = f"Tasks: {self.task_count} | Accomplished: {self.accomplished_count}"
-        self.status_bar.config(text=status_text)
+        if self.last_save_time:
+            self.last_save_label.config(
+                text=f"Last save: {self.last_save_time.strftime('%H:%M:%S')}"
+            )
+        else:
+            self.last_save_label.config(text="Last save: Never")
+        if self.last_edit_time:
+            self.last_edit_label.config(
+                text=f"Last edit: {self.last_edit_time.strftime('%H:%M:%S')}"
+            )
+        if self.external_change:
+            self.next_save_label.config(text="Next save: File changed on disk, save to resolve")
+        elif self.next_auto_save:
+            self.next_save_label.config(text=f"Next save: {self.next_auto_save.strftime('%H:%M:%S')}")
+        elif self.is_modified:
+            self.next_save_label.config(text="Next save: Unsaved changes")
+        else:
+            self.next_save_label.config(text="Next save: Idle")
+
+    def mark_modified(self):
+        """Record an edit and arm the debounced auto-save"""
+        now = datetime.now()
+        if not self.is_modified:
+            self.first_unsaved_edit = now
+        self.is_modified = True
+        self.last_edit_time = now
+        self.edit_generation += 1
+        self.schedule_auto_save()
+        if self.recovery_job is None:
+            self.recovery_job = self.root.after(RECOVERY_DELAY * 1000, self.write_recovery)
+
+    def write_recovery(self):
+        """Bring the crash-recovery copy up to date with the unsaved board, in the background"""
+        self.recovery_job = None
+        if not self.is_modified:
+            return
+        file_path = self.file_path
+        if self.recovery_stale or self.recovery_bytes >= JOURNAL_COMPACT_BYTES:
+            snapshot = self.snapshot_tasks()
+            self.recovery_ops = []
+            self.recovery_bytes = 0
+            self.recovery_stale = False
+            job = lambda: self.recovery.write_snapshot(snapshot, file_path)
+        elif self.recovery_ops:
+            lines, self.recovery_ops = self.recovery_ops, []
+            self.recovery_bytes += sum(map(len, lines))
+            job = lambda: self.recovery.append(lines, file_path)
+        else:
+            return
+        self.writer.submit(job, self.on_recovery_written)
+
+    def discard_recovery(self):
+        """Drop the crash-recovery copy once nothing is left unsaved"""
+        if self.recovery_job is not None:
+            self.root.after_cancel(self.recovery_job)
+            self.recovery_job = None
+        self.recovery_ops = []
+        self.recovery_stale = True
+        self.writer.submit(self.recovery.discard, self.on_recovery_written)
+
+    def on_recovery_written(self, error):
+        """Called on the writer thread after a recovery write"""
+        if error is not None:
+            print(f"Error writing recovery snapshot: {error}")
+            self.recovery_stale = True
+
+    def offer_recovery(self):
+        """Offer to restore the unsaved board of a session that ended without saving it, True if one was"""
+        directory = self.recovery.directory
+        for index in RecoveryStore.find_sessions(directory, self.recovery.session):
+            when = datetime.fromtimestamp(index['time']).strftime('%Y-%m-%d %H:%M:%S')
+            name = os.path.basename(index['file_path']) if index['file_path'] else "an untitled board"
+            restore = messagebox.askyesno(
+                "Recover Unsaved Work", f"Unsaved changes to {name} from {when} were found.\nRestore them?"
+            )
+            restored = RecoveryStore.load(directory, index) if restore else None
+            if restored is not None:
+                self.restore_recovery(index, *restored)
+                return True
+            self.writer.submit(lambda index=index: RecoveryStore.remove_session(directory, index), self.on_recovery_written)
+        return False
+
+    def restore_recovery(self, index, version, snapshot, ops):
+        """Load a recovered board as unsaved edits to the file it came from"""
+        for priority, records in snapshot.items():
+            if priority in self.tasks:
+                self.add_loaded_records(priority, records)
+        for op in ops:
+            self.apply_journal_op(op)
+        self.refresh_task_boxes()
+        file_path = index['file_path']
+        self.file_path = file_path if file_path and os.path.exists(file_path) else None
+        if self.file_path:
+            self.file_state = board_file_state(self.file_path)  # Saving the recovered board replaces it as it is now
+        self.journal_ready = False  # The recovered board replaces the file with a full snapshot
+        # The recovered files already hold this board, so keep extending them
+        self.recovery_stale = False
+        try:
+            self.recovery_bytes = os.path.getsize(os.path.join(self.recovery.directory, version + JOURNAL_SUFFIX))
+        except OSError:
+            self.recovery_bytes = 0
+        self.writer.submit(lambda: self.recovery.adopt(index, version, self.file_path), self.on_recovery_written)
+        self.mark_modified()
+
+    def journal_op(self, op, **fields):
+        """Record one edit as a line of UTF-8 JSON for the append-only journal"""
+        fields['op'] = op
+        line = JSON_CODEC.dumps(fields, False) + b'\n'
+        self.journal_ops.append(line)
+        self.recovery_ops.append(line)
+
+    def write_board(self, path):
+        """Snapshot the board on the UI thread and hand it to the background writer
+
+        The snapshot already contains every journalled edit, so the journal
+        restarts empty next to it.
+        """
+        snapshot = self.snapshot_tasks()
+        compact = bool(self.settings.get('compact_json'))
+        self.journal_ops = []
+        self.journal_bytes = 0
+        self.journal_ready = not is_sharded_path(path)  # Sharded boards rewrite their changed boxes instead
+        self.submit_write(path, lambda: write_snapshot(path, snapshot, compact), self.history_writer(path))
+
+    def write_journal(self, path):
+        """Append the edits made since the last save to the journal, in the background"""
+        lines, self.journal_ops = self.journal_ops, []
+        self.journal_bytes += sum(map(len, lines))
+        self.submit_write(path, lambda: append_journal(path, lines), self.history_writer(path))
+
+    def history_writer(self, path):
+        """Take the undo history changes for a save of the board at path, returning the writer's job for them
+
+        The changes since the last save are appended to the history file,
+        unless it belongs to another board or would outgrow
+        UNDO_HISTORY_COMPACT_BYTES; then it is rewritten from the stacks,
+        with the saved history read in first. Returns None when there is no
+        history to keep.
+        """
+        # A board opened without a history file gets one written in full at its first save
+        append = self.history_file == path and os.path.exists(undo_history_path(path))
+        if append:
+            lines = self.history_ops
+        else:
+            self.load_history()
+            undo, redo = self.kept_history(self.undo_stack), self.kept_history(self.redo_stack)
+            if not undo and not redo and not os.path.exists(undo_history_path(path)):
+                self.history_ops = []
+                return None
+            lines = [JSON_CODEC.dumps(['stacks', undo, redo], False) + b'\n']
+        self.history_ops = []
+        self.history_file = path
+        # Appended lines were counted as they were logged; 64 covers the begin and mark lines
+        self.history_disk_bytes = (self.history_disk_bytes if append else len(lines[0])) + 64
+
+        def write(stats):
+            try:
+                write_undo_history(path, lines, stats, append)
+            except OSError as e:
+                print(f"Error saving undo history: {e}")
+
+        return write
+
+    @staticmethod
+    def kept_history(stack):
+        """to_data of the commands on a stack, from the top down to the first not kept across sessions"""
+        kept = []
+        for command in reversed(stack):
+            data = command.to_data()
+            if data is None:
+                break
+            kept.append(data)
+        kept.reverse()
+        return kept
+
+    def log_history(self, kind, *args):
+        """Record a change to the undo or redo stack as a line to append to the undo history file"""
+        if self.history_file is None:
+            return  # The next save writes the history file in full
+        line = JSON_CODEC.dumps([kind, *args], False) + b'\n'
+        self.history_ops.append(line)
+        self.history_disk_bytes += len(line)
+        if self.history_disk_bytes >= UNDO_HISTORY_COMPACT_BYTES:
+            self.history_ops = []
+            self.history_file = None
+
+    def load_history(self):
+        """Read in the undo history saved with the board, the first time undo or redo needs it
+
+        The saved steps go below this session's own, just above the step that
+        opened the board; saved redo steps only come back if nothing has been
+        done since. Both are cut to the undo budget.
+        """
+        if self.history_pending is None:
+            return
+        path, size, stats = self.history_pending
+        self.history_pending = None
+        try:
+            history = read_undo_history(path, size, stats)
+            if history is None:
+                return  # The board was changed without its history, e.g. by another program
+            undo, redo = (self.decode_history(data) for data in history)
+        except (OSError, ValueError, LookupError, TypeError) as e:
+            print(f"Error loading undo history: {e}")
+            return
+        base = len(self.undo_stack)
+        while base and not isinstance(self.undo_stack[base - 1], ReplaceBoard):
+            base -= 1
+        if base < len(self.undo_stack) or self.redo_stack:
+            redo = []  # Cleared by the edits made since
+        self.undo_stack[base:base] = undo
+        self.redo_stack[:0] = redo
+        for command in undo + redo:
+            command.size = command.footprint(self)
+        self.trim_history()
+
+    def decode_history(self, stack):
+        """Commands from the saved data of a stack, above its last step not kept across sessions and within the budget"""
+        start = len(stack)
+        while start and stack[start - 1] is not None:
+            start -= 1
+        start = max(start, len(stack) - self.settings.get('undo_entries', UNDO_MAX_ENTRIES))
+        return [command_from_data(data) for data in stack[start:]]
+
+    def submit_write(self, path, job, history=None):
+        generation = self.edit_generation
+        self.pending_writes += 1
+        known = self.file_state if path == self.file_path else None
+        state = []
+        workspace = self.settings.get('workspace')
+        if workspace and self.is_daily_board(path):
+            counts = {priority: list(counts) for priority, counts in self.box_counts.items()}
+        else:
+            counts = None
+
+        def write():
+            job()
+            # What the file looks like after our own write, so the watcher does not mistake it for someone else's
+            stats = board_file_stats(path)
+            digests = board_file_digests(path, stats, known)
+            state.append((stats, digests))
+            if history is not None:
+                history(stats)
+            if counts is not None:
+                try:
+                    update_manifest(workspace, path, counts, stats, digests)
+                except OSError as e:
+                    print(f"Error updating manifest: {e}")
+
+        self.writer.submit(write, lambda error: self.post(self.on_board_written, path, generation, error, state))
+
+    def on_board_written(self, path, generation, error, state=()):
+        """Finish a background save on the UI thread"""
+        self.pending_writes -= 1
+        if state and path == self.file_path:
+            self.file_state = state[0]
+        if error is not None:
+            print(f"Error saving file: {error}")
+            if not self.closed:
+                messagebox.showerror("Error", f"Failed to save file: {error}")
+            if path == self.file_path:
+                self.journal_ready = False  # Journalled edits may be lost, so write a full snapshot next time
+            return
+        self.last_save_time = datetime.now()
+        # Edits made while the snapshot was being written still need saving
+        if generation == self.edit_generation and path == self.file_path:
+            self.is_modified = False
+            self.first_unsaved_edit = None
+            if not self.closed:
+                self.discard_recovery()
+        if self.closed:
+            return  # After exit run() settles the recovery copy and there is nothing left to show
+        self.schedule_auto_save()
+        self.update_status_bar()
+
+    def schedule_auto_save(self):
+        """(Re)arm the auto-save timer, or leave it idle while there is nothing to save
+
+        The save runs auto_save_delay seconds after the last edit, but never later
+        than auto_save_interval seconds after the first unsaved edit.
+        """
+        if self.auto_save_job is not None:
+            self.root.after_cancel(self.auto_save_job)
+            self.auto_save_job = None
+        self.next_auto_save = None
+        if not (self.auto_save_enabled and self.is_modified and self.file_path):
+            return
+        self.next_auto_save = min(
+            self.last_edit_time + timedelta(seconds=self.auto_save_delay),
+            self.first_unsaved_edit + timedelta(seconds=self.auto_save_interval),
+        )
+        delay = max(int((self.next_auto_save - datetime.now()).total_seconds() * 1000), 0)
+        self.auto_save_job = self.root.after(delay, self.auto_save)
+
+    def auto_save(self):
+        """Run the armed auto-save"""
+        self.auto_save_job = None
+        self.next_auto_save = None
+        if self.auto_save_enabled and self.is_modified and self.file_path and not self.is_loading():
+            if self.file_changed_on_disk():
+                # Never overwrite someone else's changes unattended, the next manual save asks
+                self.update_status_bar()
+                return
+            self.save_tasks()
+
+    def file_changed_on_disk(self):
+        """Whether the open file was changed by someone else since it was loaded or last saved"""
+        if self.external_change:
+            return True
+        if self.pending_writes or self.file_state is None:
+            return False  # Our own write is in flight, its result becomes the new baseline
+        stats = board_file_stats(self.file_path)
+        if stats == self.file_state[0]:
+            return False
+        digests = board_file_digests(self.file_path, stats, self.file_state)
+        if digests == self.file_state[1]:
+            self.file_state = (stats, digests)  # Touched but not changed, e.g. by a sync client
+            return False
+        self.external_change = True
+        return True
+
+    def resolve_conflict(self):
+        """Ask what to do about a save that would overwrite outside changes; True to overwrite"""
+        answer = messagebox.askyesnocancel(
+            "File Changed",
+            f"{os.path.basename(self.file_path)} was changed by someone else since you opened it.\n\n"
+            "Yes: overwrite their changes with your board\n"
+            "No: save your board as another file\n"
+            "Cancel: do not save"
+        )
+        if answer:
+            self.external_change = False
+            self.journal_ready = False  # Their journal does not extend our board, write it whole
+            return True
+        if answer is not None:
+            self.save_as()
+        return False
+
+    def watch_file(self):
+        """Poll the open file for outside changes, cheaply by stats, confirming by hash on a worker thread"""
+        self.root.after(WATCH_INTERVAL_MS, self.watch_file)
+        if (self.file_path is None or self.file_state is None or self.external_change or self.watch_busy
+                or self.pending_writes or self.is_loading()):
+            return
+        stats = board_file_stats(self.file_path)
+        if stats == self.file_state[0]:
+            return
+        self.watch_busy = True
+        threading.Thread(
+            target=self.read_external_change,
+            args=(self.file_path, stats, self.file_state, self.priority_names()), daemon=True
+        ).start()
+
+    def read_external_change(self, path, stats, known, boxes):
+        """Watcher thread: hash the changed files and read the board if its content really changed"""
+        board = error = None
+        try:
+            digests = board_file_digests(path, stats, known)
+            if digests != known[1]:
+                board = read_board(path, boxes)
+        except Exception as e:
+            digests, error = None, e
+        self.post(self.on_external_change, path, (stats, digests), board, error)
+
+    def on_external_change(self, path, state, board, error):
+        """Reload an outside change when there are no local edits, or flag it for the next save"""
+        self.watch_busy = False
+        if self.closed or path != self.file_path or self.pending_writes or self.is_loading():
+            return  # Superseded by an open, a save as or our own write; the next poll looks again
+        if error is not None:
+            print(f"Error reading changed file: {error}")
+            self.file_state = (state[0], self.file_state[1])  # Retry once the file changes again
+            return
+        if board is None:
+            self.file_state = state
+            return
+        if self.is_modified:
+            self.external_change = True
+        else:
+            self.file_state = state
+            self.apply_external_board(*board)
+        self.update_status_bar()
+
+    def apply_external_board(self, snapshot, ops):
+        """Patch the board to match a version changed on disk, replacing only the rows that differ"""
+        changed = []
+        for priority, records in snapshot.items():
+            tasks = self.tasks[priority]
+            old = [task.record()[1:] for task in tasks]
+            new = [record[1:] for record in records]
+            start, old_end, new_end = 0, len(old), len(new)
+            while start < min(old_end, new_end) and old[start] == new[start]:
+                start += 1
+            while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+                old_end -= 1
+                new_end -= 1
+            if start < old_end or start < new_end:
+                changed.append((priority, start, old_end, records[start:new_end]))
+
+        # Take every replaced task out first, so ids moved between boxes are free again
+        for priority, start, end, records in changed:
+            for task in self.tasks[priority][start:end]:
+                del self.task_index[task.id]
+        changes = []
+        for priority, start, end, records in changed:
+            tasks = []
+            for task_id, text, done, created, accomplished in records:
+                if task_id in self.task_index:
+                    task_id = None
+                tasks.append(Task(text, priority, done, created, accomplished, task_id))
+            self.tasks[priority][start:end] = tasks
+            self.index_box(priority, start)
+            changes += [('delete', priority, start, None)] * (end - start)
+            changes += [('insert', priority, start + offset, str(task)) for offset, task in enumerate(tasks)]
+        self.recount_tasks()
+
+        # Recorded actions may refer to rows that changed under them
+        self.clear_history()
+        if not is_sqlite_path(self.file_path):
+            self.journal_ops = []
+            self.journal_ready = ops is not None
+            self.journal_bytes = os.path.getsize(journal_path(self.file_path)) if ops is not None else 0
+        self.render(changes)
 
     def get_weather(self):
         """Get weather data for Shanghai"""
@@ -279,17 +2817,13 @@ class TaskManager:
         return None
 
     def add_task(self, priority):
-        task = self.task_input.get().strip()
-        if task:
-            self.tasks[f"Priority {priority}"].append(task)
-            self.task_boxes[f"Priority {priority}"].insert(tk.END, task)
+        if self.is_loading():
+            return
+        text = self.task_input.get().strip()
+        if text:
+            task = Task(text, f"Priority {priority}")
+            self.execute(AddTask(task.box, len(self.tasks[task.box]), task))
             self.task_input.delete(0, tk.END)
-            self.update_task_counts()  # Update counts
-            # Record action for undo
-            self.undo_stack.append(('add', priority, task))
-            self.redo_stack.clear()  # Clear redo stack on new action
-            self.last_edit_time = datetime.now()
-            self.update_status_bar()
 
     def prompt_priority(self):
         task = self.task_input.get().strip()
@@ -305,150 +2839,710 @@ class TaskManager:
             messagebox.showwarning("Warning", "Invalid priority. Please enter a number between 1 and 4.")
 
     def delete_task(self):
+        if self.is_loading():
+            return
         try:
             selected_priority, selected_index = self.get_selected_task()
             task = self.tasks[selected_priority][selected_index]
-            self.task_boxes[selected_priority].delete(selected_index)
-            del self.tasks[selected_priority][selected_index]
-            self.update_task_counts()  # Update counts
-            # Record action for undo
-            self.undo_stack.append(('delete', selected_priority, task, selected_index))
-            self.redo_stack.clear()  # Clear redo stack on new action
-            self.last_edit_time = datetime.now()
-            self.update_status_bar()
+            self.execute(DeleteTask(selected_priority, selected_index, task))
+            self.select_row(selected_priority, None)  # Nothing stays selected after a delete
         except (IndexError, ValueError):
             return  # Simply return if no task is selected
 
     def modify_task(self):
+        if self.is_loading():
+            return
         try:
             selected_priority, selected_index = self.get_selected_task()
-            old_task = self.tasks[selected_priority][selected_index]
+            task = self.tasks[selected_priority][selected_index]
             
             # Prompt user for new task description
-            new_task = simpledialog.askstring("Modify Task", "Edit task:", initialvalue=old_task)
+            new_task = simpledialog.askstring("Modify Task", "Edit task:", initialvalue=task.text)
             
             if new_task is not None:  # Check if the dialog was not cancelled
                 if new_task.strip():  # Check if the new task is not empty
                     # Update the task in the list and refresh the display
-                    self.tasks[selected_priority][selected_index] = new_task.strip()
-                    self.refresh_task_boxes()
-                    self.last_edit_time = datetime.now()
-                    self.update_status_bar()
+                    self.execute(ModifyTask(task.id, new_task.strip()))
                 else:
                     messagebox.showwarning("Warning", "Task description cannot be empty.")
         except (IndexError, ValueError):
             messagebox.showwarning("Warning", "Please select a task to modify")
 
     def move_up(self):
+        if self.is_loading():
+            return
         try:
             selected_priority, selected_index = self.get_selected_task()
             if selected_index > 0:
-                task = self.tasks[selected_priority].pop(selected_index)
-                self.tasks[selected_priority].insert(selected_index - 1, task)
-                self.refresh_task_boxes()
-                self.task_boxes[selected_priority].selection_set(selected_index - 1)
-                self.last_edit_time = datetime.now()
-                self.update_status_bar()
+                self.execute(SwapTasks(selected_priority, selected_index, selected_index - 1))
+                self.select_row(selected_priority, selected_index - 1)
         except (IndexError, ValueError):
             messagebox.showwarning("Warning", "Please select a task to move")
 
     def move_down(self):
+        if self.is_loading():
+            return
         try:
             selected_priority, selected_index = self.get_selected_task()
             if selected_index < len(self.tasks[selected_priority]) - 1:
-                task = self.tasks[selected_priority].pop(selected_index)
-                self.tasks[selected_priority].insert(selected_index + 1, task)
-                self.refresh_task_boxes()
-                self.task_boxes[selected_priority].selection_set(selected_index + 1)
-                self.last_edit_time = datetime.now()
-                self.update_status_bar()
+                self.execute(SwapTasks(selected_priority, selected_index, selected_index + 1))
+                self.select_row(selected_priority, selected_index + 1)
         except (IndexError, ValueError):
             messagebox.showwarning("Warning", "Please select a task to move")
 
     def accomplish_task(self):
+        if self.is_loading():
+            return
         try:
             selected_priority, selected_index = self.get_selected_task()
             task = self.tasks[selected_priority][selected_index]
-            if not task.endswith("(Accomplished)"):
-                # Mark the task as accomplished
-                self.tasks[selected_priority][selected_index] += " (Accomplished)"
-                
-                # Move the accomplished task to the first position
-                accomplished_task = self.tasks[selected_priority].pop(selected_index)
-                self.tasks[selected_priority].insert(0, accomplished_task)
-                
-                # Refresh the task boxes to reflect changes
-                self.refresh_task_boxes()
+            if not task.done:
+                # Mark the task as accomplished and move it to the first position, as one undo step
+                self.execute(CommandBatch([SetTaskDone(task.id, True), MoveTask(task.id, selected_priority, 0)]))
                 
                 # Select the newly moved task
-                self.task_boxes[selected_priority].selection_set(0)
-                
-                self.update_task_counts()  # Update counts
-                self.last_edit_time = datetime.now()
-                self.update_status_bar()
+                self.select_row(selected_priority, 0)
         except (IndexError, ValueError):
             messagebox.showwarning("Warning", "Please select a task to accomplish")
 
     def restore_task(self):
+        if self.is_loading():
+            return
         try:
             selected_priority, selected_index = self.get_selected_task()
             task = self.tasks[selected_priority][selected_index]
-            if task.endswith("(Accomplished)"):
-                self.tasks[selected_priority][selected_index] = task.replace(" (Accomplished)", "")
-                self.refresh_task_boxes()
-                self.last_edit_time = datetime.now()
-                self.update_status_bar()
+            if task.done:
+                self.execute(SetTaskDone(task.id, False))
         except (IndexError, ValueError):
             messagebox.showwarning("Warning", "Please select a task to restore")
 
     def get_selected_task(self):
+        # A selection queued by a previous mutation wins over the not yet repainted listboxes
+        if self.pending_selection is not None:
+            if self.pending_selection[1] is None:
+                raise ValueError("No task selected")
+            return self.pending_selection
+        if self.pending_changes:
+            self.flush_render()
         for priority, listbox in self.task_boxes.items():
             if listbox.curselection():
                 return priority, listbox.curselection()[0]
         raise ValueError("No task selected")
 
     def new_file(self):
-        for priority in self.tasks:
-            self.tasks[priority] = []
-            self.task_boxes[priority].delete(0, tk.END)
-        self.task_count = 0
-        self.counter_label.config(text="Total Tasks: 0")
+        if self.is_loading():
+            return
+        replaced = self.board_state()
+        self.reset_board()
+        self.push_undo(ReplaceBoard(replaced))  # Undo brings the previous board back
+        self.history_pending = None
+        self.history_file = None
         self.file_path = None
+        self.file_state = None
+        self.external_change = False
+        self.journal_ready = False
         self.last_edit_time = datetime.now()
         self.last_save_time = None
+        self.is_modified = False
+        self.discard_recovery()
+        self.schedule_auto_save()
         self.update_status_bar()
 
     def save_tasks(self):
+        if self.is_loading():
+            return
         if self.file_path is None:
             # If no file path is set, act like 'Save As'
             self.save_as()
+        elif self.file_changed_on_disk() and not self.resolve_conflict():
+            return
+        elif self.journal_ready and (is_sqlite_path(self.file_path) or self.journal_bytes < JOURNAL_COMPACT_BYTES):
+            # Only the edits since the last save are appended (or committed to the database)
+            self.write_journal(self.file_path)
         else:
-            # Save the tasks to the specified file path in plain text format
-            with open(self.file_path, 'w') as file:
-                json.dump(self.tasks, file, indent=4)
-            self.last_save_time = datetime.now()
-            self.update_status_bar()
+            # Compact: fold the journal into a fresh snapshot
+            self.write_board(self.file_path)
 
     def save_as(self):
+        if self.is_loading():
+            return
         file_path = filedialog.asksaveasfilename(
         defaultextension=".json",
-        filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        filetypes=[("JSON files", "*.json"), ("SQLite boards", "*.db"), ("Binary boards", "*.dtb"),
+                   ("Binary boards, zlib compressed", "*.dtbz"), ("Binary boards, lzma compressed", "*.dtbx"),
+                   ("Sharded boards", "*" + SHARD_EXTENSION), ("All files", "*.*")]
     )
-        if file_path:
-          self.file_path = file_path  # 设置文件路径
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.tasks, f, ensure_ascii=False, indent=4)
-        self.last_save_time = datetime.now()
-        self.update_status_bar()
+        if not file_path:
+            return  # Dialog cancelled
+        self.file_path = file_path  # 设置文件路径
+        self.file_state = None
+        self.external_change = False
+        self.history_file = None  # The history moves to the new file in full
+        self.write_board(self.file_path)
+        self.remember_recent(file_path)
 
     def open_file(self):
+        if self.is_loading():
+            return
         file_path = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[("Task boards", "*.json *.db *.dtb *.dtbz *.dtbx"), ("JSON files", "*.json"),
+                       ("SQLite boards", "*.db"), ("Binary boards", "*.dtb *.dtbz *.dtbx"),
+                       ("Sharded boards", SHARD_MANIFEST), ("Text outlines", "*.txt"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        if os.path.basename(file_path) == SHARD_MANIFEST and is_sharded_path(os.path.dirname(file_path)):
+            file_path = os.path.dirname(file_path)  # A sharded board is picked through its manifest
+        self.start_loading(file_path)
+
+    def is_loading(self):
+        """True while a board is still streaming in; edits wait until it has fully arrived"""
+        return self.load_queue is not None
+
+    def reset_board(self):
+        """Empty the model and the views before another board is loaded into them"""
+        self.tasks = {priority: [] for priority in self.priority_names()}
+        self.rebuild_task_index()
+        self.recount_tasks()
+        self.journal_ops = []
+        self.recovery_ops = []
+        self.recovery_stale = True
+        self.refresh_task_boxes()
+
+    def start_loading(self, file_path):
+        """Open a board progressively: a worker parses it while the UI adds tasks in time slices"""
+        self.cache_current_board()
+        self.replaced_board = self.board_state()
+        self.replaced_edits = (
+            self.is_modified, self.first_unsaved_edit, self.journal_ops, self.journal_ready, self.recovery_ops
+        )
+        try:
+            cached = self.snapshot_cache.get(file_path, board_file_stats(file_path))
+        except OSError:
+            cached = None
+        if cached is not None:
+            self.open_cached(file_path, cached)
+            return
+        self.reset_board()
+        self.file_path = None
+        self.is_modified = False
+        self.schedule_auto_save()
+        self.load_queue = queue.Queue()
+        threading.Thread(
+            target=self.read_board_worker, args=(file_path, self.priority_names(), self.load_queue), daemon=True
+        ).start()
+        self.load_progress.config(value=0)
+        self.load_progress.pack(side='right', padx=5)
+        self.root.after(LOAD_SLICE_MS, self.pump_loading, file_path)
+
+    def board_state(self):
+        """The board on screen with its file and unread undo history, as ReplaceBoard keeps it"""
+        return self.tasks, self.file_path, self.file_state, self.history_pending
+
+    def restore_replaced_board(self):
+        """Put back the board an open that failed had replaced, with its file and unsaved edits"""
+        self.tasks, self.file_path, self.file_state, self.history_pending = self.replaced_board
+        self.replaced_board = None
+        (self.is_modified, self.first_unsaved_edit, self.journal_ops, self.journal_ready,
+         self.recovery_ops) = self.replaced_edits
+        self.rebuild_task_index()
+        self.recount_tasks()
+        self.refresh_task_boxes()
+        self.schedule_auto_save()
+        self.update_status_bar()
+
+    def push_replaced_board(self):
+        """Make the open that just ended undoable, bringing back the board it replaced"""
+        if self.replaced_board is not None:
+            self.push_undo(ReplaceBoard(self.replaced_board))
+            self.replaced_board = None
+
+    def cache_current_board(self):
+        """Keep the board being closed decoded in memory, if it is exactly what is on disk"""
+        if (self.file_path and self.file_state is not None and not self.is_modified and not self.pending_writes
+                and not self.external_change and not self.is_loading()):
+            self.snapshot_cache.put(
+                self.file_path, self.snapshot_tasks(), self.file_state, self.journal_ready, self.journal_bytes
+            )
+
+    def open_cached(self, file_path, entry):
+        """Open a board straight from the snapshot cache, with no reading or parsing"""
+        snapshot, state, journal_ready, journal_bytes, count = entry
+        self.reset_board()
+        for priority, records in snapshot.items():
+            self.add_loaded_records(priority, records)
+        self.finish_loading(file_path, state, (journal_ready, journal_bytes))
+
+    @staticmethod
+    def read_board_worker(file_path, boxes, out):
+        """Loader thread: parse the board and queue its tasks in chunks"""
+        try:
+            # Taken before reading, so a change made while the board streams in is still noticed
+            state = board_file_state(file_path)
+            for priority, records, progress in iter_board_chunks(file_path, boxes):
+                out.put(('chunk', priority, records, progress))
+            out.put(('done', None, state, 1.0))
+        except Exception as e:
+            out.put(('error', None, e, None))
+
+    def pump_loading(self, file_path):
+        """Add queued chunks to the board for one time slice, then yield to the event loop"""
+        deadline = time.perf_counter() + LOAD_SLICE_MS / 1000
+        while time.perf_counter() < deadline:
+            try:
+                kind, priority, records, progress = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'chunk':
+                self.add_loaded_records(priority, records)
+                self.load_progress.config(value=progress)
+            elif kind == 'done':
+                self.finish_loading(file_path, records)
+                return
+            else:
+                self.load_queue = None
+                self.pending_rollover = False
+                self.load_progress.pack_forget()
+                self.restore_replaced_board()
+                print(f"Error opening file: {records}")
+                messagebox.showerror("Error", f"Failed to open file: {records}")
+                return
+        self.root.after(1, self.pump_loading, file_path)
+
+    def add_loaded_records(self, priority, records):
+        """Append a chunk of loaded task records to the end of a box"""
+        tasks = self.tasks[priority]
+        task_index = self.task_index
+        start = len(tasks)
+        self.shared_stale.add(priority)
+        for position, (task_id, text, done, created, accomplished) in enumerate(records, start):
+            if task_id in task_index:
+                task_id = None  # Duplicated id (e.g. copied entry), give it a fresh one
+            task = Task(text, priority, done, created, accomplished, task_id)
+            tasks.append(task)
+            task_index[task.id] = (priority, position)
+        self.adjust_counts(priority, len(records), sum(task.done for task in tasks[start:]))
+        if not self.use_virtual_boxes and len(tasks) > VIRTUAL_BOX_THRESHOLD:
+            self.set_virtual_boxes(True)  # Also redraws the boxes
+        else:
+            texts = None if self.use_virtual_boxes else [str(task) for task in tasks[start:]]
+            self.render([('extend', priority, start, texts)])
+
+    def finish_loading(self, file_path, state=None, journal=None):
+        """Apply the journal once every task has arrived and point saves at the opened file
+
+        ``journal`` is (journal_ready, journal_bytes) for a board from the
+        snapshot cache, whose journal is already applied.
+        """
+        self.load_queue = None
+        self.load_progress.pack_forget()
+        self.push_replaced_board()
+        if journal is not None:
+            self.journal_ready, self.journal_bytes = journal
+            self.journal_ops = []
+        elif is_sqlite_path(file_path):
+            # The database is always up to date, edits are committed on top of it
+            self.journal_ready = True
+        elif is_sharded_path(file_path):
+            self.journal_ready = False  # Each save writes the boxes that changed
+            self.journal_ops = []
+        elif self.replay_journal(file_path):
+            self.refresh_task_boxes()
+        # Later saves and auto-saves go back to the opened file
+        self.file_path = file_path
+        self.file_state = state
+        # Its undo history is only read when undo first needs it, so opening costs one stat
+        try:
+            size = os.path.getsize(undo_history_path(file_path))
+        except OSError:
+            size = 0
+        self.history_pending = (file_path, size, state[0]) if size and state is not None else None
+        self.history_file = file_path
+        self.history_disk_bytes = size
+        self.history_ops = []
+        self.external_change = False
+        self.last_save_time = None
+        self.is_modified = False
+        self.discard_recovery()
+        self.schedule_auto_save()
+        self.update_status_bar()
+        self.remember_recent(file_path)
+        if self.pending_rollover:
+            self.pending_rollover = False
+            if self.is_past_daily_board(file_path):
+                self.roll_over_day()
+
+    def toggle_daily_workspace(self):
+        """Turn the daily workspace on (choosing its folder) or off"""
+        if not self.daily_workspace_var.get():
+            self.settings.pop('workspace', None)
+        else:
+            workspace = filedialog.askdirectory(title="Choose the daily workspace folder")
+            if not workspace:
+                self.daily_workspace_var.set(False)
+                return
+            self.settings['workspace'] = os.path.abspath(workspace)
+        self.store_settings()
+        if self.settings.get('workspace'):
+            self.open_daily_board()
+        self.schedule_rollover()
+
+    def toggle_compact_json(self):
+        """Save JSON boards without indentation, from the next save on"""
+        self.settings['compact_json'] = self.compact_json_var.get()
+        self.store_settings()
+        self.journal_ready = False  # The next save rewrites the file in the chosen layout
+
+    def store_settings(self):
+        try:
+            save_settings(self.settings)
+        except OSError as e:
+            print(f"Error saving settings: {e}")
+            messagebox.showerror("Error", f"Failed to save settings: {e}")
+
+    def remember_recent(self, file_path):
+        """Put a board at the top of the Recent Files menu"""
+        file_path = os.path.abspath(file_path)
+        recent = [path for path in self.settings.get('recent', []) if path != file_path]
+        self.settings['recent'] = ([file_path] + recent)[:RECENT_FILES]
+        self.store_settings()
+        self.update_recent_menu()
+
+    def update_recent_menu(self):
+        self.recent_menu.delete(0, tk.END)
+        recent = self.settings.get('recent', [])
+        for number, path in enumerate(recent, 1):
+            self.recent_menu.add_command(label=f"{number}. {os.path.basename(path)}",
+                                         command=lambda path=path: self.open_recent(path))
+        if not recent:
+            self.recent_menu.add_command(label="(Empty)", state='disabled')
+
+    def open_recent(self, file_path):
+        if self.is_loading():
+            return
+        if not os.path.exists(file_path):
+            messagebox.showerror("Error", f"Failed to open file: {file_path} no longer exists")
+            self.settings['recent'] = [path for path in self.settings.get('recent', []) if path != file_path]
+            self.store_settings()
+            self.update_recent_menu()
+            return
+        self.start_loading(file_path)
+
+    def open_daily_board(self):
+        """Open today's board in the daily workspace, or roll the latest earlier one over to today"""
+        if self.is_loading():
+            return
+        if self.is_modified:
+            self.save_tasks()  # Keep the board being replaced
+            if self.file_path is None:
+                self.daily_workspace_var.set(bool(self.settings.get('workspace')))
+                return  # Save As was cancelled
+        workspace = self.settings['workspace']
+        today = daily_board_path(workspace, date.today())
+        try:
+            previous = None if os.path.exists(today) else latest_daily_board(workspace, date.today())
+        except OSError as e:
+            print(f"Error opening daily workspace: {e}")
+            messagebox.showerror("Error", f"Failed to open daily workspace: {e}")
+            return
+        if previous is None and not os.path.exists(today):
+            # First day in this workspace
+            self.reset_board()
+            self.clear_history()
+            self.file_path = today
+            self.file_state = None
+            self.external_change = False
+            self.write_board(today)
+            self.update_status_bar()
+        else:
+            self.pending_rollover = True  # An earlier day is rolled over once it has loaded
+            self.start_loading(previous or today)
+
+    def is_daily_board(self, path):
+        """Whether path is a day's board in the daily workspace"""
+        workspace = self.settings.get('workspace')
+        if not workspace or not path or daily_board_date(path) is None:
+            return False
+        return os.path.normcase(os.path.dirname(os.path.abspath(path))) == os.path.normcase(workspace)
+
+    def is_past_daily_board(self, path):
+        """Whether path is the board of an earlier day in the daily workspace"""
+        return self.is_daily_board(path) and daily_board_date(path) < date.today()
+
+    def roll_over_day(self):
+        """Move from an earlier day's board to today's, carrying the unfinished tasks forward
+
+        The earlier file keeps the day as it ended, accomplished tasks included;
+        today's file starts with only the open tasks, in their boxes and order.
+        """
+        if self.is_modified:
+            self.save_tasks()  # The snapshot or journal lines are taken now, before the board changes
+        today = daily_board_path(self.settings['workspace'], date.today())
+        if os.path.exists(today):
+            self.start_loading(today)  # Already started, e.g. by another instance
+            return
+        self.render([('box', priority, None, None) for priority in self.remove_accomplished()])
+        # Recorded actions refer to the previous day's file
+        self.clear_history()
+        self.recovery_stale = True
+        self.file_path = today
+        self.file_state = None
+        self.external_change = False
+        self.write_board(today)
+        self.update_status_bar()
+
+    def schedule_rollover(self):
+        """Arm the midnight rollover while a daily workspace is in use"""
+        if self.rollover_job is not None:
+            self.root.after_cancel(self.rollover_job)
+            self.rollover_job = None
+        if not self.settings.get('workspace'):
+            return
+        self.rollover_day = date.today()
+        midnight = datetime.combine(self.rollover_day + timedelta(days=1), datetime.min.time())
+        delay = int((midnight - datetime.now()).total_seconds() * 1000) + 1000
+        self.rollover_job = self.root.after(delay, self.on_midnight)
+
+    def on_midnight(self):
+        self.rollover_job = None
+        if self.is_loading():
+            self.rollover_job = self.root.after(1000, self.on_midnight)
+            return
+        # Only the board that was current when the day ended moves on, not an old one being browsed
+        if self.is_daily_board(self.file_path) and daily_board_date(self.file_path) == self.rollover_day:
+            self.roll_over_day()
+        self.schedule_rollover()
+
+    def show_history(self):
+        """List the boards of the daily workspace with their counts, straight from the manifest"""
+        workspace = self.settings.get('workspace')
+        if not workspace:
+            messagebox.showinfo("Info", "Turn on the daily workspace to browse its history")
+            return
+        # On the writer, so the manifest is never rewritten by two threads at once
+        boxes = self.priority_names()
+        result = []
+        self.writer.submit(
+            lambda: result.append(refresh_manifest(workspace, boxes)),
+            lambda error: self.post(self.show_history_window, workspace, result, error)
         )
-        if file_path:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.tasks = json.load(f)
-                self.refresh_task_boxes()
+
+    def show_history_window(self, workspace, result, error):
+        """Open the History window once the writer has refreshed the manifest"""
+        if error is not None:
+            print(f"Error reading history: {error}")
+            messagebox.showerror("Error", f"Failed to read history: {error}")
+            return
+        boards = result[0]
+        window = tk.Toplevel(self.root)
+        window.title("History")
+        priorities = self.priority_names()
+        columns = ('date', 'open', 'accomplished') + tuple(priorities)
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=20)
+        for column, heading in zip(columns, ("Date", "Open", "Accomplished", *priorities)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=100 if column == 'date' else 90, anchor='center')
+        scrollbar = ttk.Scrollbar(window, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        for name, entry in sorted(boards.items(), key=lambda item: item[1]['date'] or '', reverse=True):
+            counts = [entry['counts'].get(priority, [0, 0]) for priority in priorities]
+            total = sum(count[0] for count in counts)
+            accomplished = sum(count[1] for count in counts)
+            # Per box: accomplished / total
+            tree.insert('', tk.END, iid=name, values=(
+                entry['date'], total - accomplished, accomplished, *(f"{count[1]}/{count[0]}" for count in counts)
+            ))
+
+        def open_selected(event=None):
+            selection = tree.selection()
+            if selection and not self.is_loading():
+                window.destroy()
+                if self.is_modified:
+                    self.save_tasks()
+                self.start_loading(os.path.join(workspace, selection[0]))
+
+        tree.bind('<Double-1>', open_selected)
+        ttk.Button(window, text="Open", command=open_selected).pack(side='bottom', pady=5)
+        scrollbar.pack(side='right', fill='y')
+        tree.pack(side='left', fill='both', expand=True)
+
+    def priority_names(self):
+        return [f"Priority {i}" for i in range(1, 5)]
+
+    def replay_journal(self, path):
+        """Apply the edits journalled since the snapshot at path was written and return how many there were"""
+        self.journal_ops = []
+        try:
+            journal = read_journal(path)
+        except JournalMismatch as e:
+            journal = None
+            self.set_aside_journal(path, e)
+        if journal is None:
+            self.journal_ready = False
+            self.journal_bytes = 0
+            return 0
+        ops, intact = journal
+        self.journal_ready = intact  # Past a torn line the next save writes a fresh snapshot instead
+        self.journal_bytes = os.path.getsize(journal_path(path))
+        for op in ops:
+            self.apply_journal_op(op)
+        return len(ops)
+
+    def set_aside_journal(self, path, error):
+        """Copy a journal that does not match its board out of the way of the next save, and tell the user"""
+        kept = journal_path(path) + '.unmatched'
+        try:
+            with open(journal_path(path), 'rb') as f:
+                write_atomic(kept, f.read())
+        except OSError as e:
+            print(f"Error keeping journal: {e}")
+            kept = journal_path(path)
+        print(f"Warning: {error}")
+        messagebox.showwarning(
+            "Warning", f"{error}, so its edits were not applied.\nThe journal is kept as {os.path.basename(kept)}."
+        )
+
+    def apply_journal_op(self, op):
+        """Apply one journalled edit to the model, skipping edits to tasks that are gone"""
+        kind = op['op']
+        if kind == 'clear':
+            self.remove_accomplished()
+            return
+        if kind == 'reinsert':
+            placed = [(position, Task.from_record(record, op['box'])) for position, record in op['tasks']]
+            self.merge_tasks(op['box'], [(position, task) for position, task in placed if task.id not in self.task_index])
+            return
+        if kind == 'add':
+            task = Task.from_dict(op['task'], op['box'])
+            if task.id not in self.task_index:
+                self.insert_task(op['box'], op['index'], task)
+            return
+        if op['id'] not in self.task_index:
+            return
+        task = self.get_task(op['id'])
+        if kind == 'delete':
+            self.pop_task(*self.locate_task(task.id))
+        elif kind == 'modify':
+            self.set_task_text(task, op['text'])
+        elif kind in ('move', 'drag'):
+            self.insert_task(op['box'], op['index'], self.pop_task(*self.locate_task(task.id)))
+        elif kind == 'accomplish':
+            self.set_task_done(task, True, op['at'])
+        elif kind == 'restore':
+            self.set_task_done(task, False)
+
+    def snapshot_tasks(self):
+        """Take an immutable copy of the board that other threads can read safely"""
+        return {priority: tuple(task.record() for task in tasks) for priority, tasks in self.tasks.items()}
+
+    def rebuild_task_index(self):
+        """Rebuild the id -> (priority, position) index for the whole board"""
+        self.task_index = {}
+        for priority in self.tasks:
+            self.index_box(priority)
+
+    def index_box(self, priority, start=0):
+        """Record the box and position of every task in a box from start onwards"""
+        tasks = self.tasks[priority]
+        for position in range(start, len(tasks)):
+            self.task_index[tasks[position].id] = (priority, position)
+
+    def locate_task(self, task_id):
+        """Return the (priority, position) of a task by id"""
+        return self.task_index[task_id]
+
+    def get_task(self, task_id):
+        """Return a task by id"""
+        priority, position = self.task_index[task_id]
+        return self.tasks[priority][position]
+
+    def insert_task(self, priority, index, task):
+        """Insert a task into a box, keep the index and counters up to date and return its position"""
+        task.box = priority
+        index = min(index, len(self.tasks[priority]))
+        self.tasks[priority].insert(index, task)
+        self.index_box(priority, index)
+        self.adjust_counts(priority, 1, int(task.done))
+        shared = self.shared_box(priority)
+        if shared is not None:
+            self.shared_board[priority] = shared.insert(index, task.record())
+        return index
+
+    def pop_task(self, priority, index):
+        """Remove a task from a box and keep the index and counters up to date"""
+        task = self.tasks[priority].pop(index)
+        del self.task_index[task.id]
+        self.index_box(priority, index)
+        self.adjust_counts(priority, -1, -int(task.done))
+        shared = self.shared_box(priority)
+        if shared is not None:
+            self.shared_board[priority] = shared.delete(index)
+        return task
+
+    def merge_tasks(self, priority, placed):
+        """Put tasks back into a box at their former positions, given as ascending (position, task) pairs, in one pass"""
+        if not placed:
+            return
+        for position, task in placed:
+            task.box = priority
+        self.tasks[priority] = merge_at_positions(self.tasks[priority], placed)
+        self.shared_stale.add(priority)
+        self.index_box(priority, placed[0][0])
+        self.adjust_counts(priority, len(placed), sum(task.done for position, task in placed))
+
+    def set_task_done(self, task, done, accomplished=None):
+        """Mark a task as accomplished (now, or at the given time) or not and adjust the counters"""
+        if task.done != done:
+            task.done = done
+            task.accomplished = time.time() if done else None
+            self.adjust_counts(task.box, 0, 1 if done else -1)
+        if done and accomplished is not None:
+            task.accomplished = accomplished
+        self.share_task(task)
+
+    def set_task_text(self, task, text):
+        task.text = text
+        self.share_task(task)
+
+    def shared_box(self, priority):
+        """The shared copy of a box to edit in step with it, None while checkpoints are off or the box is stale"""
+        if self.shared_board is None or priority in self.shared_stale:
+            return None
+        return self.shared_board[priority]
+
+    def share_task(self, task):
+        """Bring the shared copy of a task up to date after it changed in place"""
+        shared = self.shared_box(task.box)
+        if shared is not None:
+            self.shared_board[task.box] = shared.set(self.task_index[task.id][1], task.record())
+
+    def adjust_counts(self, priority, total_delta, accomplished_delta):
+        """Apply a delta to the per-box and global counters"""
+        counts = self.box_counts[priority]
+        counts[0] += total_delta
+        counts[1] += accomplished_delta
+        self.task_count += total_delta
+        self.accomplished_count += accomplished_delta
+
+    def recount_tasks(self):
+        """Recompute all counters from scratch, used after the whole board is replaced"""
+        self.shared_stale.update(self.tasks)
+        self.box_counts = {
+            priority: [len(tasks), sum(task.done for task in tasks)]
+            for priority, tasks in self.tasks.items()
+        }
+        self.task_count = sum(counts[0] for counts in self.box_counts.values())
+        self.accomplished_count = sum(counts[1] for counts in self.box_counts.values())
+
+    def swap_tasks(self, priority, first, second):
+        """Swap two tasks within a box"""
+        tasks = self.tasks[priority]
+        tasks[first], tasks[second] = tasks[second], tasks[first]
+        self.task_index[tasks[first].id] = (priority, first)
+        self.task_index[tasks[second].id] = (priority, second)
+        shared = self.shared_box(priority)
+        if shared is not None:
+            self.shared_board[priority] = shared.set(first, tasks[first].record()).set(second, tasks[second].record())
 
     def export_pdf(self):
         try:
@@ -527,80 +3621,340 @@ class TaskManager:
             messagebox.showerror("Error", f"Failed to create PDF: {str(e)}")
 
     def refresh_task_boxes(self):
-        for priority in self.tasks:
-            self.task_boxes[priority].delete(0, tk.END)
-            for task in self.tasks[priority]:
-                self.task_boxes[priority].insert(tk.END, task)
-        self.update_task_counts()  # Update counts
+        """Rebuild every task box, used when the whole board is replaced"""
+        self.render([('box', priority, None, None) for priority in self.tasks])
+
+    def render_box(self, priority):
+        """Rebuild one task box with a single batched insert"""
+        listbox = self.task_boxes[priority]
+        listbox.delete(0, tk.END)
+        if self.use_virtual_boxes:
+            listbox.schedule_redraw()  # Rows are read straight from the model
+        elif self.tasks[priority]:
+            listbox.insert(tk.END, *[str(task) for task in self.tasks[priority]])
+
+    def render(self, changes):
+        """Queue a change-set for the next repaint
+
+        Each change is (kind, priority, index, text) where kind is 'insert',
+        'delete', 'update', 'extend' (append the texts) or 'box' (rebuild the
+        whole box). Changes are replayed
+        in order, so indices refer to the box as left by the previous change.
+        """
+        self.pending_changes.extend(changes)
+        self.schedule_render()
+
+    def schedule_render(self):
+        """Arrange a single flush for the next idle cycle"""
+        if self.render_job is None:
+            self.render_job = self.root.after_idle(self.flush_render)
+
+    def flush_render(self):
+        """Apply every queued change, the pending selection and the counters in one repaint"""
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
+        changes, self.pending_changes = self.pending_changes, []
+
+        # Boxes marked for a rebuild, or patched too often in this burst, are redrawn once
+        patches = {}
+        for kind, priority, index, text in changes:
+            patches[priority] = patches.get(priority, 0) + 1
+        rebuild = {priority for kind, priority, index, text in changes if kind == 'box'}
+        rebuild.update(priority for priority, count in patches.items() if count > RENDER_PATCH_LIMIT)
+
+        for kind, priority, index, text in changes:
+            listbox = self.task_boxes[priority]
+            if priority in rebuild:
+                continue
+            elif kind == 'insert':
+                listbox.insert(index, text)
+            elif kind == 'extend':
+                listbox.insert(tk.END, *(text or ()))  # Rows appended by a streaming open
+            elif kind == 'delete':
+                listbox.delete(index)
+            elif kind == 'update':
+                selected = listbox.selection_includes(index)
+                listbox.delete(index)
+                listbox.insert(index, text)
+                if selected:
+                    listbox.selection_set(index)
+        for priority in rebuild:
+            self.render_box(priority)
+
+        if self.pending_selection is not None:
+            priority, index = self.pending_selection
+            self.pending_selection = None
+            listbox = self.task_boxes[priority]
+            listbox.selection_clear(0, tk.END)
+            if index is not None:
+                listbox.selection_set(index)
+                listbox.see(index)
+
+        self.update_task_counts()
+        self.update_status_bar()
+
+    def row_updates(self, priority, *indices):
+        """Build 'update' changes for rows whose task changed in place"""
+        return [('update', priority, index, str(self.tasks[priority][index])) for index in indices]
+
+    def select_row(self, priority, index):
+        """Select a single row in a task box on the next repaint, or clear the box for None"""
+        self.pending_selection = (priority, index)
+        self.schedule_render()
 
     def update_task_counts(self):
-        self.task_count = sum(len(tasks) for tasks in self.tasks.values())
-        self.accomplished_count = sum(task.endswith("(Accomplished)") for tasks in self.tasks.values() for task in tasks)
+        """Show the maintained counters on the counter label and each box title"""
         self.counter_label.config(text=f"Total Tasks: {self.task_count} | Accomplished Tasks: {self.accomplished_count}")
+        for i in range(1, 5):
+            total, accomplished = self.box_counts[f"Priority {i}"]
+            self.task_frames[f"Priority {i}"].config(
+                text=f"{self.priority_labels[i]} - Total: {total} | Accomplished: {accomplished}"
+            )
+
+    def execute(self, command):
+        """Apply an edit, show it and keep it for undo"""
+        if self.shared_board is not None:
+            command.checkpoint = self.take_checkpoint()
+        self.render(command.apply(self))
+        self.push_undo(command)
+        self.mark_modified()
+
+    def push_undo(self, command):
+        """Record an edit that has been made for undo
+
+        An edit that carries on the last one, on the same task within the
+        merge window and with nothing undone in between, is merged into it
+        so both are undone as one step.
+        """
+        now = time.monotonic()
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if (last is not None and not self.redo_stack
+                and now - last.stamp <= self.settings.get('undo_merge_seconds', UNDO_MERGE_SECONDS)):
+            merged = last.merge(command, self)
+            if merged is not None:
+                merged.checkpoint = last.checkpoint  # The board before the first of the merged edits
+                merged.stamp = now
+                self.undo_stack.pop()
+                self.remember(self.undo_stack, merged)
+                self.log_history('top', merged.to_data())
+                return
+        self.redo_stack.clear()  # Clear redo stack on new action
+        command.stamp = now
+        self.remember(self.undo_stack, command)
+        self.log_history('push', command.to_data())
+
+    def remember(self, stack, command):
+        """Put a command on the undo or redo stack, then evict the oldest history beyond the budget"""
+        command.size = command.footprint(self)
+        stack.append(command)
+        self.trim_history()
+
+    def trim_history(self):
+        """Evict the oldest undo steps, then the furthest redo steps, until the history fits its budget
+
+        The newest undo step always stays, however large it is.
+        """
+        max_entries = self.settings.get('undo_entries', UNDO_MAX_ENTRIES)
+        max_bytes = self.settings.get('undo_megabytes', UNDO_MAX_MEGABYTES) * 1024 * 1024
+        entries = len(self.undo_stack) + len(self.redo_stack)
+        size = sum(command.size for command in self.undo_stack) + sum(command.size for command in self.redo_stack)
+        while entries > max_entries or size > max_bytes:
+            if len(self.undo_stack) > 1:
+                command = self.undo_stack.pop(0)
+            elif self.redo_stack:
+                command = self.redo_stack.pop(0)
+            else:
+                break
+            entries -= 1
+            size -= command.size
+        self.history_bytes = size
+        self.undo_label.config(text=f"Undo: {entries} steps, {size / (1024 * 1024):.1f} MB")
+
+    def clear_history(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.history_pending = None
+        self.log_history('clear')
+        self.trim_history()
+
+    def set_undo_budget(self):
+        entries = simpledialog.askinteger(
+            "Undo Budget", "Most undo steps to keep:",
+            initialvalue=self.settings.get('undo_entries', UNDO_MAX_ENTRIES), minvalue=1
+        )
+        if entries is None:
+            return
+        megabytes = simpledialog.askinteger(
+            "Undo Budget", "Most memory for undo, in MB:",
+            initialvalue=self.settings.get('undo_megabytes', UNDO_MAX_MEGABYTES), minvalue=1
+        )
+        if megabytes is None:
+            return
+        self.settings['undo_entries'] = entries
+        self.settings['undo_megabytes'] = megabytes
+        self.store_settings()
+        self.trim_history()
 
     def undo(self):
+        if self.is_loading():
+            return
+        self.load_history()
         if not self.undo_stack:
             messagebox.showinfo("Info", "Nothing to undo")
             return
 
-        action = self.undo_stack.pop()
-        if action[0] == 'add':
-            priority, task = action[1], action[2]
-            self.tasks[f"Priority {priority}"].remove(task)
-            self.refresh_task_boxes()
-            # Record action for redo
-            self.redo_stack.append(('add', priority, task))
-        elif action[0] == 'delete':
-            priority, task, index = action[1], action[2], action[3]
-            self.tasks[priority].insert(index, task)
-            self.refresh_task_boxes()
-            # Record action for redo
-            self.redo_stack.append(('delete', priority, task, index))
+        command = self.undo_stack.pop()
+        self.render(command.revert(self))
+        # Record action for redo
+        self.remember(self.redo_stack, command)
+        self.log_history('undo', command.to_data())
+        self.mark_modified()
+
+    def undo_several(self):
+        if self.is_loading():
+            return
+        self.load_history()
+        if not self.undo_stack:
+            messagebox.showinfo("Info", "Nothing to undo")
+            return
+        count = simpledialog.askinteger(
+            "Undo Several", f"Number of edits to undo (1-{len(self.undo_stack)}):",
+            minvalue=1, maxvalue=len(self.undo_stack)
+        )
+        if count:
+            self.undo_steps(count)
+
+    def undo_steps(self, count):
+        """Undo the last count edits, in one jump to a checkpoint when each of them kept one
+
+        The jump is a single redo step. Edits made while checkpoints were off
+        (or New and Open, which swap the file too) are undone one by one.
+        """
+        commands = self.undo_stack[-count:]
+        if any(command.checkpoint is None for command in commands):
+            for _ in commands:
+                self.undo()
+            return
+        jump = BoardCheckpoint(commands[0].checkpoint)
+        self.render(jump.apply(self))
+        del self.undo_stack[-count:]
+        self.remember(self.redo_stack, jump)
+        self.log_history('jump', count)
+        self.mark_modified()
+
+    def toggle_undo_checkpoints(self):
+        self.settings['undo_checkpoints'] = self.undo_checkpoints_var.get()
+        self.store_settings()
+        self.set_undo_checkpoints(self.settings['undo_checkpoints'])
+        self.trim_history()
+
+    def set_undo_checkpoints(self, enabled):
+        """Keep (or drop) the structurally shared copy of the board that undo checkpoints are taken from"""
+        if enabled:
+            self.shared_board = {priority: PersistentList() for priority in self.tasks}
+            self.shared_stale = set(self.tasks)  # Built at the first checkpoint
+        else:
+            self.shared_board = None
+            self.shared_stale = set()
+            for command in self.undo_stack + self.redo_stack:
+                command.checkpoint = None  # Jumps fall back to single steps and the memory is freed
+                command.size = command.footprint(self)
+
+    def take_checkpoint(self):
+        """Return the board as structurally shared boxes, O(1) unless a box was replaced in bulk since the last one"""
+        if self.shared_board is None:
+            # Checkpoints were turned off after a jump was recorded, so build one from scratch
+            return {priority: PersistentList(task.record() for task in tasks) for priority, tasks in self.tasks.items()}
+        for priority in self.shared_stale:
+            self.shared_board[priority] = PersistentList(task.record() for task in self.tasks[priority])
+        self.shared_stale.clear()
+        return dict(self.shared_board)
+
+    def restore_checkpoint(self, board):
+        """Put a checkpoint back on the board
+
+        Tasks in leaves the checkpoint shares with the board as it is are
+        kept as they are; only the others are built again from their records.
+        The edits it skips are not journalled, so the next save writes a full snapshot.
+        """
+        current = self.take_checkpoint()
+        tasks = {}
+        for priority, records in board.items():
+            live = self.tasks[priority]
+            starts = {}
+            start = 0
+            for leaf in current[priority].leaves():
+                starts[id(leaf)] = start
+                start += len(leaf)
+            box = tasks[priority] = []
+            for leaf in records.leaves():
+                start = starts.get(id(leaf)) if leaf else None
+                if start is not None:
+                    box += live[start:start + len(leaf)]
+                else:
+                    box += [Task.from_record(record, priority) for record in leaf]
+        self.tasks = tasks
+        self.rebuild_task_index()
+        self.recount_tasks()
+        if self.shared_board is not None:
+            self.shared_board = dict(board)
+            self.shared_stale.clear()
+        self.journal_ops = []
+        self.journal_ready = False
+        self.recovery_stale = True
 
     def redo(self):
+        if self.is_loading():
+            return
+        self.load_history()
         if not self.redo_stack:
             messagebox.showinfo("Info", "Nothing to redo")
             return
 
-        action = self.redo_stack.pop()
-        if action[0] == 'add':
-            priority, task = action[1], action[2]
-            self.tasks[f"Priority {priority}"].append(task)
-            self.refresh_task_boxes()
-            # Record action for undo
-            self.undo_stack.append(('add', priority, task))
-        elif action[0] == 'delete':
-            priority, task, index = action[1], action[2], action[3]
-            self.tasks[priority].remove(task)
-            self.refresh_task_boxes()
-            # Record action for undo
-            self.undo_stack.append(('delete', priority, task, index))
+        command = self.redo_stack.pop()
+        self.render(command.apply(self))
+        # Record action for undo
+        self.remember(self.undo_stack, command)
+        self.log_history('redo', command.to_data())
+        self.mark_modified()
 
     def run(self):
         self.root.mainloop()
+        self.closed = True
+        # Let a save that is still being written finish, and take in its outcome, before exiting
+        self.writer.flush()
+        self.run_completions()
+        # Unsaved edits stay in the recovery snapshot and are offered at the next start
+        if self.is_modified and not self.is_loading():
+            self.write_recovery()
+            self.writer.flush()
+        else:
+            self.recovery.discard()
 
     def show_about(self):
         messagebox.showinfo("About", "Daily Tasker\nVersion 1.0.005")
 
     def clear_all_accomplished(self):
-        for priority, tasks in self.tasks.items():
-            self.tasks[priority] = [task for task in tasks if not task.endswith("(Accomplished)")]
-        self.refresh_task_boxes()
-        self.update_task_counts()
-        self.last_edit_time = datetime.now()
-        self.update_status_bar()
+        if self.is_loading() or not self.accomplished_count:
+            return
+        self.execute(ClearAccomplished())
 
-    def auto_save_loop(self):
-        """Background thread for auto-saving"""
-        while True:
-            time.sleep(1)  # Check every second
-            if (
-                self.auto_save_enabled
-                and self.file_path
-                and self.last_edit_time
-                and (datetime.now() - self.last_edit_time).seconds >= self.auto_save_interval
-            ):
-                self.save_tasks()
+    def remove_accomplished(self):
+        """Drop every accomplished task from the model, returning them as {priority: [(position, task), ...]}"""
+        removed = {}
+        for priority, tasks in self.tasks.items():
+            if not self.box_counts[priority][1]:
+                continue  # Nothing accomplished in this box
+            placed = removed[priority] = [(position, task) for position, task in enumerate(tasks) if task.done]
+            self.shared_stale.add(priority)
+            for position, task in placed:
+                del self.task_index[task.id]
+            self.tasks[priority] = [task for task in tasks if not task.done]
+            # Every remaining task is open, so the box loses all its accomplished ones
+            self.adjust_counts(priority, -len(placed), -len(placed))
+            self.index_box(priority, placed[0][0])
+        return removed
 
     def update_weather(self):
         """Update weather information"""
@@ -620,5 +3974,8 @@ class TaskManager:
         self.root.after(300000, self.update_weather)
 
 if __name__ == "__main__":
-    app = TaskManager()
-    app.run()
\ No newline at end of file
+    if '--benchmark-json' in sys.argv:
+        benchmark_json_codecs()
+    else:
+        app = TaskManager()
+        app.run()
\ No newline at end of file